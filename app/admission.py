@@ -0,0 +1,234 @@
+"""
+Admission control for the upload and bulk endpoints.
+
+Views opt in with a `rate_limit_scopes` mapping of actions (or HTTP methods for
+plain views) to an endpoint class in RATE_LIMITS. Each class is a per-user token
+bucket, and classes marked as uploads also share a limit of
+MAX_CONCURRENT_UPLOADS uploads in progress. The buckets live in the local
+RATE_LIMIT_CACHE_ALIAS cache and the uploads in progress are counted by the
+process itself, so no external service is needed.
+
+Under ASGI Django reads the whole body before running any middleware, so
+AdmissionControlMiddleware wraps the ASGI application to reject requests before
+their body is received. Under WSGI the body is read lazily and
+app.middlewares.AdmissionMiddleware does the same check.
+"""
+import io
+import json
+import logging
+import math
+import threading
+import time
+from typing import NamedTuple
+
+from corsheaders.middleware import CorsMiddleware
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from app.auth_cache import token_cache
+
+logger = logging.getLogger("django")
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class Rejection(NamedTuple):
+    status: int
+    detail: str
+    retry_after: int
+
+    @property
+    def headers(self):
+        return {
+            "Content-Type": "application/json",
+            "Retry-After": str(self.retry_after),
+        }
+
+    @property
+    def content(self):
+        return json.dumps({"detail": self.detail}).encode()
+
+
+def parse_rate(rate):
+    """
+    Returns:
+        float: Tokens refilled per second for a rate like "30/min".
+    """
+    num, period = rate.split("/")
+    return int(num) / PERIODS[period[0]]
+
+
+def get_limit_scope(path, method):
+    """
+    Returns:
+        str: The RATE_LIMITS endpoint class of the view serving the request, or
+        None when the view isn't limited.
+    """
+    try:
+        view = resolve(path).func
+    except Resolver404:
+        return None
+
+    scopes = getattr(getattr(view, "cls", view), "rate_limit_scopes", None)
+    if not scopes:
+        return None
+
+    # Viewsets map HTTP methods to actions, plain views are keyed by method
+    actions = getattr(view, "actions", None) or {}
+    return scopes.get(actions.get(method.lower(), method.lower()))
+
+
+def get_client_key(raw_token, client_ip):
+    """Buckets are per user for valid tokens, per address otherwise."""
+    if raw_token:
+        cached = token_cache.lookup(raw_token)
+        if cached is not None:
+            return f"user:{cached.user_id}"
+        try:
+            validated_token = JWTAuthentication().get_validated_token(raw_token)
+            return f"user:{validated_token[jwt_settings.USER_ID_CLAIM]}"
+        except (InvalidToken, TokenError, KeyError):
+            pass
+
+    return f"ip:{client_ip}"
+
+
+class AdmissionController:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Not in the cache, which may evict it among the buckets
+        self.uploads = 0
+
+    @property
+    def cache(self):
+        return caches[settings.RATE_LIMIT_CACHE_ALIAS]
+
+    def is_upload(self, scope):
+        return settings.RATE_LIMITS[scope].get("upload", False)
+
+    def admit(self, scope, client_key):
+        """
+        Takes a token from the client's bucket and, for uploads, an upload slot.
+        Slots must be given back with release_upload() once the request is done.
+
+        Returns:
+            Rejection: Why the request is rejected, or None when admitted.
+        """
+        if self.is_upload(scope) and not self.acquire_upload():
+            logger.warning(
+                f"Upload rejected, {settings.MAX_CONCURRENT_UPLOADS} in progress"
+            )
+            return Rejection(503, "Too many uploads in progress, try again shortly.", 1)
+
+        wait = self.take_token(scope, client_key)
+        if wait:
+            if self.is_upload(scope):
+                self.release_upload()
+            logger.warning(f"Request rate limited: {scope} for {client_key}")
+            return Rejection(
+                429,
+                f"Request was throttled. Expected available in {math.ceil(wait)} seconds.",
+                math.ceil(wait),
+            )
+
+        return None
+
+    def take_token(self, scope, client_key):
+        """
+        Returns:
+            float: Seconds until a token is available, 0 when one was taken.
+        """
+        limit = settings.RATE_LIMITS[scope]
+        rate = parse_rate(limit["rate"])
+        capacity = limit.get("burst", 1)
+        key = f"admission:{scope}:{client_key}"
+        now = time.monotonic()
+
+        with self.lock:
+            tokens, updated_at = self.cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            # Once expired the bucket would have refilled completely anyway
+            self.cache.set(key, (tokens, now), math.ceil(capacity / rate))
+
+        return wait
+
+    def acquire_upload(self):
+        with self.lock:
+            if self.uploads >= settings.MAX_CONCURRENT_UPLOADS:
+                return False
+            self.uploads += 1
+            return True
+
+    def release_upload(self):
+        with self.lock:
+            self.uploads -= 1
+
+
+admission = AdmissionController()
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware rejecting limited requests before their body is read."""
+
+    def __init__(self, app):
+        self.app = app
+        # Only its headers are used, the rejections never reach a view
+        self.cors = CorsMiddleware(lambda request: None)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit_scope = get_limit_scope(scope["path"], scope["method"])
+        if limit_scope is None:
+            return await self.app(scope, receive, send)
+
+        # Lets AdmissionMiddleware know the request was already admitted
+        scope["admission_checked"] = True
+
+        authorization = (
+            dict(scope["headers"]).get(b"authorization", b"").decode("latin1")
+        )
+        raw_token = authorization[7:] if authorization.startswith("Bearer ") else None
+        client_ip = (scope.get("client") or ("",))[0]
+
+        rejection = admission.admit(limit_scope, get_client_key(raw_token, client_ip))
+        if rejection is not None:
+            await self.reject(scope, send, rejection)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if admission.is_upload(limit_scope):
+                admission.release_upload()
+
+    async def reject(self, scope, send, rejection):
+        # The response skips Django's middleware, and without the CORS headers
+        # browsers hide its status and Retry-After behind a network error
+        response = self.cors.add_response_headers(
+            ASGIRequest(scope, io.BytesIO()),
+            HttpResponse(
+                rejection.content, status=rejection.status, headers=rejection.headers
+            ),
+        )
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [
+                    (name.lower().encode("latin1"), value.encode("latin1"))
+                    for name, value in response.items()
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": response.content})
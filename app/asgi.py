@@ -4,4 +4,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from app.admission import AdmissionControlMiddleware  # noqa: E402
+
+# Rejects rate limited uploads before Django reads the request body
+application = AdmissionControlMiddleware(django_application)
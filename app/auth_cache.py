@@ -0,0 +1,168 @@
+"""
+In-process cache of verified access tokens and the users they belong to.
+
+Mobile clients send thousands of requests with the same token, so after the first
+request the signature check and the user query are served from here. Entries are
+keyed by a digest of the token and never outlive the token's `exp`.
+
+Setting AUTH_CACHE_ALIAS to a shared cache (e.g. Redis) lets workers share entries
+and invalidations: every user has a generation counter in the shared cache, and
+entries created under an older generation are ignored. Without it an invalidation
+only reaches the current process, which is why the cache is then disabled unless
+AUTH_CACHE_TTL is set explicitly.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+
+from app.metrics import record_cache_lookup
+
+# Enough to authorize requests and to be assigned to foreign keys. The remaining
+# fields are deferred, so a save() on the cached user can't overwrite them.
+USER_FIELDS = ("id", "username", "email", "is_active", "is_staff", "is_superuser")
+
+
+class CachedAuth(NamedTuple):
+    validated_token: object
+    user_values: tuple
+    generation: int
+    expires_at: float
+
+    @property
+    def user_id(self):
+        return self.user_values[0]
+
+    def get_user(self):
+        return User.from_db("default", USER_FIELDS, self.user_values)
+
+
+class TokenCache:
+    KEY_PREFIX = "auth-cache:"
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.keys_by_user = defaultdict(set)
+        self.lock = threading.Lock()
+
+    @property
+    def shared_cache(self):
+        alias = settings.AUTH_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get(self, raw_token):
+        """
+        Returns:
+            CachedAuth: The cached verification of the token, or None.
+        """
+        if settings.AUTH_CACHE_TTL <= 0:
+            return None
+
+        entry = self.lookup(raw_token)
+        record_cache_lookup("auth_token", entry is not None)
+        return entry
+
+    def lookup(self, raw_token):
+        key = self.digest(raw_token)
+        now = time.time()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self.entries.move_to_end(key)
+                else:
+                    self.remove(key, entry)
+                    entry = None
+
+        shared_cache = self.shared_cache
+        if shared_cache is None:
+            return entry
+
+        if entry is None:
+            entry = shared_cache.get(self.KEY_PREFIX + key)
+            if entry is None or entry.expires_at <= now:
+                return None
+
+        if entry.generation != self.get_generation(entry.user_id):
+            with self.lock:
+                self.remove(key, self.entries.get(key))
+            return None
+
+        return entry
+
+    def set(self, validated_token, user):
+        if settings.AUTH_CACHE_TTL <= 0 or not user.is_active:
+            return
+
+        now = time.time()
+        expires_at = min(now + settings.AUTH_CACHE_TTL, validated_token["exp"])
+        if expires_at <= now:
+            return
+
+        key = self.digest(validated_token.token)
+        entry = CachedAuth(
+            validated_token=validated_token,
+            user_values=tuple(getattr(user, field) for field in USER_FIELDS),
+            generation=self.get_generation(user.id),
+            expires_at=expires_at,
+        )
+
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self.keys_by_user[user.id].add(key)
+            while len(self.entries) > settings.AUTH_CACHE_MAX_ENTRIES:
+                oldest_key, oldest_entry = next(iter(self.entries.items()))
+                self.remove(oldest_key, oldest_entry)
+
+        shared_cache = self.shared_cache
+        if shared_cache is not None:
+            shared_cache.set(self.KEY_PREFIX + key, entry, timeout=expires_at - now)
+
+    def invalidate_user(self, user_id):
+        """Drops every cached token of a user, e.g. after a password change."""
+        with self.lock:
+            for key in self.keys_by_user.pop(user_id, ()):
+                self.entries.pop(key, None)
+
+        shared_cache = self.shared_cache
+        if shared_cache is not None:
+            generation_key = f"{self.KEY_PREFIX}generation:{user_id}"
+            try:
+                shared_cache.incr(generation_key)
+            except ValueError:
+                shared_cache.set(generation_key, 1, timeout=None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_user.clear()
+
+    def get_generation(self, user_id):
+        shared_cache = self.shared_cache
+        if shared_cache is None:
+            return 0
+        return shared_cache.get(f"{self.KEY_PREFIX}generation:{user_id}", 0)
+
+    def remove(self, key, entry):
+        # Must be called with the lock held
+        self.entries.pop(key, None)
+        if entry is not None:
+            self.keys_by_user[entry.user_id].discard(key)
+            if not self.keys_by_user[entry.user_id]:
+                del self.keys_by_user[entry.user_id]
+
+    @staticmethod
+    def digest(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).hexdigest()
+
+
+token_cache = TokenCache()
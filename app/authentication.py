@@ -0,0 +1,37 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from app.auth_cache import token_cache
+from app.server_timing import timing
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    DRF authentication that reuses the token JWTAuthMiddleware already verified,
+    and the user it found in the token cache.
+
+    Falls back to the regular header parsing and verification for requests the
+    middleware skips, e.g. the excluded paths.
+    """
+
+    def authenticate(self, request):
+        with timing("auth"):
+            return self.authenticate_request(request)
+
+    def authenticate_request(self, request):
+        validated_token = getattr(request._request, "validated_token", None)
+        if validated_token is None:
+            return super().authenticate(request)
+
+        user = getattr(request._request, "cached_user", None)
+        if user is None:
+            user = self.get_user(validated_token)
+            token_cache.set(validated_token, user)
+
+        return user, validated_token
+
+
+class StatelessJWTScheme(SimpleJWTScheme):
+    """The schema's "jwtAuth" bearer scheme, which only matches JWTAuthentication."""
+
+    target_class = "app.authentication.StatelessJWTAuthentication"
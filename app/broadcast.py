@@ -0,0 +1,208 @@
+"""
+Pushes events to the users connected to /api/events.
+
+Every process keeps the subscriptions of its open event streams, by user. Events
+are published when the transaction that caused them commits, so a client fetching
+what it was told about finds it, and reach the subscriptions of every process
+through the backend set by EVENTS_BACKEND:
+- "local": delivered in the publishing process only, for development, tests and
+  single-process servers.
+- "postgres": sent with NOTIFY and delivered by every process that LISTENs on the
+  channel, over one extra database connection per process.
+
+An idle subscription is a set and an asyncio.Event; pending events of the same
+type are coalesced, so a slow client can't make its subscription grow.
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+import orjson
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger("django")
+
+CHANNEL = "photos_events"
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_PAYLOAD_BYTES = 7999
+RECONNECT_SECONDS = 5
+
+
+class Subscription:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.pending = set()
+        self.ready = asyncio.Event()
+
+    def deliver(self, events):
+        # Runs on the subscription's event loop
+        self.pending.update(events)
+        self.ready.set()
+
+    async def next_events(self, timeout):
+        """
+        Returns:
+            list: The events received since the last call, or an empty list if
+            none arrived within `timeout` seconds.
+        """
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.ready.clear()
+        events, self.pending = sorted(self.pending), set()
+        return events
+
+
+class LocalBackend:
+    def start(self):
+        pass
+
+    def publish(self, messages):
+        for message in messages:
+            broadcaster.deliver(message)
+
+
+class PostgresBackend:
+    def __init__(self):
+        self.connection = None
+
+    def start(self):
+        """Starts listening on the running event loop, unless it already is."""
+        if self.connection is None:
+            try:
+                self.listen()
+            except Exception:
+                logger.exception("Could not LISTEN for events, retrying")
+                self.retry()
+
+    def listen(self):
+        # A connection of its own: Django's are per thread and may be closed or
+        # in a transaction at any time
+        database = connections["default"]
+        self.connection = database.get_new_connection(
+            database.get_connection_params()
+        )
+        self.connection.autocommit = True
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        asyncio.get_running_loop().add_reader(self.connection.fileno(), self.receive)
+
+    def receive(self):
+        try:
+            self.connection.poll()
+        except Exception:
+            logger.exception("Lost the events connection, reconnecting")
+            self.close()
+            self.retry()
+            return
+
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            broadcaster.deliver(orjson.loads(notify.payload))
+
+    def retry(self):
+        asyncio.get_running_loop().call_later(RECONNECT_SECONDS, self.start)
+
+    def close(self):
+        if self.connection is not None:
+            asyncio.get_running_loop().remove_reader(self.connection.fileno())
+            self.connection.close()
+            self.connection = None
+
+    def publish(self, messages):
+        with connections["default"].cursor() as cursor:
+            for message in messages:
+                cursor.execute(
+                    "SELECT pg_notify(%s, %s)",
+                    [CHANNEL, orjson.dumps(message).decode()],
+                )
+
+
+BACKENDS = {"local": LocalBackend, "postgres": PostgresBackend}
+
+
+def split_messages(items):
+    """
+    Returns:
+        list: Messages of events by user ID, each at most MAX_PAYLOAD_BYTES long
+        once encoded.
+    """
+    messages, message, size = [], {}, len(b"{}")
+    for user_id, events in items:
+        # "<user_id>":[...] and a comma
+        item_size = len(orjson.dumps({user_id: events})) - 1
+        if message and size + item_size > MAX_PAYLOAD_BYTES:
+            messages.append(message)
+            message, size = {}, len(b"{}")
+        message[user_id] = events
+        size += item_size
+    if message:
+        messages.append(message)
+    return messages
+
+
+class Broadcaster:
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+        self.backend = None
+
+    def get_backend(self):
+        if self.backend is None:
+            self.backend = BACKENDS[settings.EVENTS_BACKEND]()
+        return self.backend
+
+    def subscribe(self, user_id):
+        """Must be called from the event loop the events are awaited on."""
+        self.get_backend().start()
+        subscription = Subscription(user_id)
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions[subscription.user_id]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.user_id]
+
+    def publish(self, events_by_user):
+        """
+        Sends each user's events to their streams once the current transaction
+        commits.
+
+        Args:
+            events_by_user (dict): Event types by user ID.
+        """
+        # JSON object keys are strings
+        items = [
+            (str(user_id), sorted(events))
+            for user_id, events in events_by_user.items()
+            if events
+        ]
+        messages = split_messages(items)
+        if messages:
+            # Robust: a lost event must not fail a request that already committed
+            transaction.on_commit(
+                lambda: self.get_backend().publish(messages), robust=True
+            )
+
+    def deliver(self, message):
+        """Hands a published message to the subscriptions in this process."""
+        with self.lock:
+            targets = [
+                (subscription, events)
+                for user_id, events in message.items()
+                for subscription in self.subscriptions.get(int(user_id), ())
+            ]
+        for subscription, events in targets:
+            # Publishers run in other threads or on other event loops
+            subscription.loop.call_soon_threadsafe(subscription.deliver, events)
+
+
+broadcaster = Broadcaster()
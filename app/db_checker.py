@@ -1,6 +1,7 @@
 from django.db import connection
 from django.db.utils import OperationalError, DatabaseError
 import logging
+import time
 
 logger = logging.getLogger("django")
 
@@ -16,16 +17,18 @@ class DatabaseHealthChecker:
         Checks if the database connection is healthy by executing a simple query.
 
         Returns:
-            dict: A dictionary with status information
+            dict: A dictionary with status information and the round-trip latency
         """
         try:
             # Execute a simple query to check database connection
+            started_at = time.perf_counter()
             with connection.cursor() as cursor:
                 cursor.execute("SELECT 1")
                 cursor.fetchone()
+            latency_ms = (time.perf_counter() - started_at) * 1000
 
-            logger.info("Database health check: OK")
-            return {"status": "healthy"}
+            logger.info(f"Database health check: OK ({latency_ms:.1f} ms)")
+            return {"status": "healthy", "latency_ms": round(latency_ms, 3)}
 
         except (OperationalError, DatabaseError) as e:
             error_message = str(e)
@@ -0,0 +1,70 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+# The replica the current request reads from, set per request by
+# ReplicaRoutingMiddleware; None outside of a request so management commands,
+# shells and background work always read from the primary.
+_replica = ContextVar("replica", default=None)
+
+
+def use_replica(enabled):
+    """
+    Marks the current context as safe (or not) to read from a replica. Every read
+    of the context goes to the same, randomly chosen, replica, so the reads of a
+    request never see an older state than the ones before them.
+
+    Returns:
+        Token: A token that can be passed to reset_replica() to restore the
+        previous routing decision.
+    """
+    replicas = settings.REPLICA_DATABASES
+    return _replica.set(random.choice(replicas) if enabled and replicas else None)
+
+
+def reset_replica(token):
+    _replica.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Sends the reads made inside the block to the primary."""
+    token = use_replica(False)
+    try:
+        yield
+    finally:
+        reset_replica(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Routes reads to the replica chosen for the current request, if any, and keeps
+    every write, migration and transaction on the primary database.
+    """
+
+    primary = "default"
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None:
+            return self.primary
+
+        # Reads inside a transaction on the primary must see its uncommitted rows
+        if connections[self.primary].in_atomic_block:
+            return self.primary
+
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return self.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias points at the same data set, so relations are always valid
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == self.primary
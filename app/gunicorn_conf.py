@@ -0,0 +1,108 @@
+"""
+Production server: gunicorn managing uvicorn workers.
+
+    gunicorn -c python:app.gunicorn_conf app.asgi:application
+
+The application is imported once, in the master process, and WEB_CONCURRENCY
+workers are forked from it, sharing the imported code. A worker is replaced after
+about MAX_REQUESTS requests, or as soon as its resident memory passes
+WORKER_MAX_RSS_MB; it finishes the requests in flight first. It refuses to start
+without a SECRET_KEY of its own. DEBUG is forced off, which among other things
+stops Django from keeping every query of a request in memory. The workers share
+logs/*.log, which logrotate rotates instead of each of them, see
+LOG_ROTATE_EXTERNALLY.
+"""
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+
+# Before the application, and with it the settings, is imported
+os.environ["DEBUG"] = "0"
+os.environ["LOG_ROTATE_EXTERNALLY"] = "1"
+
+# It also derives the JWT signing key: with the development default anyone could
+# sign tokens
+if os.environ.get("SECRET_KEY", "local") == "local":
+    sys.exit("Set SECRET_KEY to a secret value to run the production server.")
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+# Async workers each serve many requests at once, one per core is enough
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+preload_app = True
+
+# The jitter keeps workers from restarting all at once
+max_requests = int(os.environ.get("MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", 1000))
+# 0 disables the memory limit
+worker_max_rss_mb = int(os.environ.get("WORKER_MAX_RSS_MB", 512))
+memory_check_seconds = 10
+# Open /api/events streams never finish, they are closed after this long
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+
+accesslog = None
+errorlog = "-"
+
+
+def on_starting(server):
+    # Metrics files of the previous run would be added to this one's
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def when_ready(server):
+    # Connections opened while importing the application must not be shared
+    # with the workers
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    # Before the worker accepts requests, so readiness has a result at once
+    from app.health_prober import health_prober
+
+    health_prober.start()
+
+    # Background work queued by workers that were recycled
+    from photos import recovery
+
+    recovery.start()
+
+    if worker_max_rss_mb:
+        threading.Thread(
+            target=watch_memory, args=(worker,), name="memory-watch", daemon=True
+        ).start()
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def get_rss_mb():
+    with open("/proc/self/statm") as file:
+        pages = int(file.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def watch_memory(worker):
+    """Shuts the worker down gracefully once it uses too much memory."""
+    while True:
+        time.sleep(memory_check_seconds)
+        rss_mb = get_rss_mb()
+        if rss_mb > worker_max_rss_mb:
+            worker.log.info(
+                f"Worker {worker.pid} uses {rss_mb:.0f} MB, more than "
+                f"WORKER_MAX_RSS_MB ({worker_max_rss_mb}), restarting it"
+            )
+            # Handled by uvicorn like a shutdown, the master starts a new worker
+            os.kill(worker.pid, signal.SIGTERM)
+            return
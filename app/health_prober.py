@@ -0,0 +1,97 @@
+"""
+Background prober for the readiness checks.
+
+Load balancers probe aggressively, and running the checks on every probe both
+loads the database and makes probes pile up when it is slow. Instead, each worker
+runs the checks in a daemon thread every HEALTH_PROBE_INTERVAL seconds, and the
+health views only read the latest snapshot, which takes constant time.
+
+gunicorn workers probe once before serving their first request, see
+app/gunicorn_conf.py, so a recycled worker never answers readiness with
+"starting". Other servers start probing on the first health request.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .db_checker import DatabaseHealthChecker
+from .storage_checker import StorageHealthChecker
+
+logger = logging.getLogger("django")
+
+
+class HealthProber:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        # (checked_at, checks), replaced as a whole so readers never need the lock
+        self.snapshot = None
+
+    def get_snapshot(self):
+        """
+        Returns:
+            tuple: The time of the last probe and the result of every check, or
+            None until the first probe has finished.
+        """
+        self.ensure_started()
+        return self.snapshot
+
+    def is_stale(self, snapshot):
+        # A probe stuck on an unresponsive dependency stops refreshing the result
+        return time.time() - snapshot[0] > settings.HEALTH_PROBE_INTERVAL * 3
+
+    def start(self):
+        """Probes now, then keeps probing in the background."""
+        with self.lock:
+            self.pid = os.getpid()
+            self.snapshot = None
+            self.probe_safely()
+            self.start_thread(wait_first=True)
+
+    def ensure_started(self):
+        # Threads don't survive a fork, so every worker process starts its own
+        if self.pid == os.getpid():
+            return
+
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.snapshot = None
+            self.start_thread(wait_first=False)
+
+    def start_thread(self, wait_first):
+        threading.Thread(
+            target=self.run, args=(wait_first,), name="health-prober", daemon=True
+        ).start()
+
+    def run(self, wait_first):
+        if wait_first:
+            time.sleep(settings.HEALTH_PROBE_INTERVAL)
+        while True:
+            self.probe_safely()
+            time.sleep(settings.HEALTH_PROBE_INTERVAL)
+
+    def probe_safely(self):
+        try:
+            self.probe()
+        except Exception:
+            logger.exception("Health probe failed")
+
+    def probe(self):
+        try:
+            database = DatabaseHealthChecker.check_health()
+        finally:
+            # Don't keep a connection open per worker between probes
+            connection.close()
+
+        storage = StorageHealthChecker.check_health()
+        self.snapshot = (time.time(), {"database": database, "storage": storage})
+
+
+health_prober = HealthProber()
@@ -0,0 +1,98 @@
+"""
+Logging handlers that keep file and console I/O off the request path.
+
+QueuedHandler only puts records on an in-memory queue; a listener thread formats
+them and hands them to the real handler (e.g. a TimedRotatingFileHandler, which
+also rotates the file from that thread). A disk stall therefore delays the log
+lines, not the requests, and when the queue is full records are dropped instead
+of blocking.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from django.utils.module_loading import import_string
+
+
+class QueuedHandler(QueueHandler):
+    """
+    Configured like the handler it wraps:
+
+        "file": {
+            "()": "app.log_handlers.QueuedHandler",
+            "handler_class": "logging.handlers.TimedRotatingFileHandler",
+            "filename": "...",
+            "when": "midnight",
+            "formatter": "verbose",
+        }
+    """
+
+    def __init__(self, handler_class, queue_size=10000, **handler_kwargs):
+        super().__init__(queue.Queue(queue_size))
+        self.target = import_string(handler_class)(**handler_kwargs)
+        self.dropped = 0
+        self.start_listener()
+
+        atexit.register(self.stop_listener)
+        # Listener threads do not survive a fork, e.g. into preloaded workers
+        os.register_at_fork(after_in_child=self.restart_listener)
+
+    def start_listener(self):
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def restart_listener(self):
+        # The copied queue still lists the parent's listener as waiting, and would
+        # wake that thread instead of the new one, which then never sees the stop
+        # sentinel and keeps the process from exiting
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.start_listener()
+
+    def stop_listener(self):
+        # Flushes the queue before the process exits
+        self.listener.stop()
+
+    def setFormatter(self, fmt):
+        # Formatting happens in the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Resolve the message now, while its arguments still hold their values,
+        # and leave the formatting to the target handler
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line. Fields passed with
+    `extra={"fields": {...}}` are merged into the object.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
@@ -1,2 +1,6 @@
 from .contextual_logging import RequestResponseLoggingMiddleware
-from .authentication import JWTAuthMiddleware
\ No newline at end of file
+from .authentication import JWTAuthMiddleware
+from .replica_routing import ReplicaRoutingMiddleware
+from .server_timing import ServerTimingMiddleware
+from .metrics import MetricsMiddleware
+from .admission import AdmissionMiddleware
@@ -0,0 +1,73 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from app.admission import admission, get_client_key, get_limit_scope
+
+
+class AdmissionMiddleware:
+    """
+    Applies the rate limits and the concurrent upload limit of app.admission.
+
+    Requests served through app.admission.AdmissionControlMiddleware were already
+    admitted before their body was read and are passed through.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        limit_scope = self.get_limit_scope(request)
+        if limit_scope is None:
+            return self.get_response(request)
+
+        rejection = admission.admit(limit_scope, self.get_client_key(request))
+        if rejection is not None:
+            return self.rejection_response(rejection)
+
+        try:
+            return self.get_response(request)
+        finally:
+            if admission.is_upload(limit_scope):
+                admission.release_upload()
+
+    async def __acall__(self, request):
+        limit_scope = self.get_limit_scope(request)
+        if limit_scope is None:
+            return await self.get_response(request)
+
+        rejection = admission.admit(limit_scope, self.get_client_key(request))
+        if rejection is not None:
+            return self.rejection_response(rejection)
+
+        try:
+            return await self.get_response(request)
+        finally:
+            if admission.is_upload(limit_scope):
+                admission.release_upload()
+
+    def get_limit_scope(self, request):
+        if getattr(request, "scope", {}).get("admission_checked"):
+            return None
+        return get_limit_scope(request.path_info, request.method)
+
+    def get_client_key(self, request):
+        # Set by JWTAuthMiddleware, so the token isn't verified again
+        validated_token = getattr(request, "validated_token", None)
+        if validated_token is not None:
+            return f"user:{validated_token[jwt_settings.USER_ID_CLAIM]}"
+        return get_client_key(None, request.META.get("REMOTE_ADDR"))
+
+    def rejection_response(self, rejection):
+        return HttpResponse(
+            rejection.content, status=rejection.status, headers=rejection.headers
+        )
@@ -1,8 +1,11 @@
 # mixins/jwt_mixin.py
-import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
-from django.contrib import auth
 from django.http import JsonResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from app.auth_cache import token_cache
+from app.server_timing import timing
 from app.exceptions import (
     AuthenticationCredentialsNotProvidedException,
     InvalidOrExpiredTokenException,
@@ -14,19 +17,22 @@ logger = logging.getLogger("django")
 
 
 class JWTMixin:
+    token_authentication = JWTAuthentication()
+
     def verify_jwt_token(self, token):
+        """
+        Verifies the signature, expiry and type of an access token.
+
+        Returns:
+            Token: The validated rest_framework_simplejwt token. It is attached to
+            the request so DRF authentication does not verify it a second time.
+        """
         try:
-            payload = jwt.decode(
-                token,
-                settings.SIMPLE_JWT["SIGNING_KEY"],
-                algorithms=[settings.SIMPLE_JWT["ALGORITHM"]],
-            )
+            validated_token = self.token_authentication.get_validated_token(token)
             logger.info("Token decoded and verified")
-            return payload
-        except jwt.ExpiredSignatureError:
-            raise InvalidOrExpiredTokenException("Token has expired.")
-        except jwt.InvalidTokenError:
-            raise InvalidOrExpiredTokenException("Invalid token.")
+            return validated_token
+        except InvalidToken:
+            raise InvalidOrExpiredTokenException()
 
     def get_token_from_request(self, request):
         auth_header = request.headers.get("Authorization", None)
@@ -48,36 +54,86 @@ class JWTAuthMiddleware(JWTMixin):
         "/api/token",
         "/api/redoc",
         "/api/schema",
-        "/api/users/register"
+        "/api/users/register",
+        "/metrics",
+        "/api/health",
+        # Authorized by the signed token in the path, see photos.deletion
+        "/api/deletions/status/",
     ]
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        if not any(request.path.startswith(path) for path in self.EXCLUDED_PATHS):
-            try:
-                logger.info("Token Validation Started")
-                token = self.get_token_from_request(request)
-                if not token:
-                    raise AuthenticationCredentialsNotProvidedException()
-
-                payload = self.verify_jwt_token(token)
-                print(payload)
-                if not payload:
-                    raise InvalidOrExpiredTokenException()
-
-                request.session['user'] = payload
-                logger.info(f"Token has been verified for user {payload}")
-
-            except AuthenticationCredentialsNotProvidedException as e:
-                request.session.flush()
-                logger.error("Authentication Credentials Not provided")
-                return JsonResponse({"error": str(e)}, status=401)
-            except InvalidOrExpiredTokenException as e:
-                request.session.flush()
-                logger.error("Invired or Expired Token")
-                return JsonResponse({"error": str(e)}, status=401)
+        if self.async_mode:
+            return self.__acall__(request)
+
+        error_response = self.process_request(request)
+        if error_response:
+            return error_response
 
         response = self.get_response(request)
         return response
+
+    async def __acall__(self, request):
+        error_response = self.process_request(request)
+        if error_response:
+            return error_response
+
+        response = await self.get_response(request)
+        return response
+
+    def process_request(self, request):
+        """
+        Verifies the token once and attaches it to the request as
+        `validated_token`, along with `cached_user` when the token was found in
+        the token cache. Nothing is stored in the session, so authenticated
+        requests never cause a session write.
+        """
+        if self.is_excluded(request):
+            return None
+
+        try:
+            with timing("auth"):
+                request.validated_token = self.authenticate(request)
+            logger.info(
+                "Token has been verified for user "
+                f"{request.validated_token.get(settings.SIMPLE_JWT['USER_ID_CLAIM'])}"
+            )
+        except (
+            AuthenticationCredentialsNotProvidedException,
+            InvalidOrExpiredTokenException,
+        ) as e:
+            return self.error_response(e)
+
+        return None
+
+    def is_excluded(self, request):
+        return any(request.path.startswith(path) for path in self.EXCLUDED_PATHS)
+
+    def authenticate(self, request):
+        logger.info("Token Validation Started")
+        token = self.get_token_from_request(request)
+        if not token:
+            raise AuthenticationCredentialsNotProvidedException()
+
+        # A token seen recently skips the signature check and the user query
+        cached = token_cache.get(token)
+        if cached is not None:
+            request.cached_user = cached.get_user()
+            return cached.validated_token
+
+        return self.verify_jwt_token(token)
+
+    def error_response(self, exception):
+        if isinstance(exception, AuthenticationCredentialsNotProvidedException):
+            logger.error("Authentication Credentials Not provided")
+        else:
+            logger.error("Invired or Expired Token")
+        return JsonResponse({"error": str(exception)}, status=401)
@@ -1,58 +1,99 @@
 import logging
-import json
+import random
 import time
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 
-logger = logging.getLogger("django")
+logger = logging.getLogger("access")
 
 
 class RequestResponseLoggingMiddleware:
+    """
+    Writes one structured access log line per request.
+
+    Errors and slow requests are always logged; successful ones are sampled at
+    ACCESS_LOG_SAMPLE_RATE. Only the headers in ACCESS_LOG_HEADERS are recorded,
+    so credentials never reach the logs. The line is only queued here; the
+    "access" logger's QueuedHandler writes it from a background thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
         self.exclude_paths = ["/api/docs/"]
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
         response = self.process_request(request)
         response = response or self.get_response(request)
         response = self.process_response(request, response)
         return response
 
+    async def __acall__(self, request):
+        response = self.process_request(request)
+        response = response or await self.get_response(request)
+        response = self.process_response(request, response)
+        return response
+
     def process_request(self, request):
         if any(request.path.startswith(path) for path in self.exclude_paths):
             # Skip logging for excluded paths
             return None
 
-        request.start_time = time.time()
-
-        # Get the client's IP address
-        client_ip = request.META.get("REMOTE_ADDR")
-
-        # Log the incoming request
-        request_log = {
-            "method": request.method,
-            "path": request.path,
-            "headers": dict(request.headers),
-            "query_parameters": request.GET.dict(),
-            "client_ip": client_ip,
-        }
-        logger.info(f"Incoming Request: {json.dumps(request_log)}")
+        request.start_time = time.perf_counter()
 
     def process_response(self, request, response):
         if hasattr(request, "start_time"):
-            end_time = time.time()
-            execution_time = end_time - request.start_time
+            execution_time = time.perf_counter() - request.start_time
+            response["X-Execution-Time"] = str(execution_time)
 
-            # Get the client's IP address
-            client_ip = request.META.get("REMOTE_ADDR")
+            if self.should_log(response.status_code, execution_time):
+                logger.info(
+                    f"{request.method} {request.path} {response.status_code}",
+                    extra={
+                        "fields": self.get_log_fields(request, response, execution_time)
+                    },
+                )
 
-            response_log = {
-                "status_code": response.status_code,
-                "headers": dict(response.items()),
-                "execution_time": f"{execution_time:.6f} seconds",
-                "client_ip": client_ip,
-            }
-            logger.info(f"Outgoing Response: {json.dumps(response_log)}")
+        return response
 
-            response["X-Execution-Time"] = str(execution_time)
+    def should_log(self, status_code, execution_time):
+        if status_code >= 400:
+            return True
+        if execution_time * 1000 >= settings.ACCESS_LOG_SLOW_REQUEST_MS:
+            return True
+        return random.random() < settings.ACCESS_LOG_SAMPLE_RATE
 
-        return response
+    def get_log_fields(self, request, response, execution_time):
+        allowed_headers = settings.ACCESS_LOG_HEADERS
+        validated_token = getattr(request, "validated_token", None)
+
+        return {
+            "method": request.method,
+            "path": request.path,
+            "query_string": request.META.get("QUERY_STRING", ""),
+            "status_code": response.status_code,
+            "execution_time_ms": round(execution_time * 1000, 3),
+            "client_ip": request.META.get("REMOTE_ADDR"),
+            "user_id": (
+                validated_token.get(settings.SIMPLE_JWT["USER_ID_CLAIM"])
+                if validated_token is not None
+                else None
+            ),
+            "request_headers": {
+                name: request.headers[name]
+                for name in allowed_headers
+                if name in request.headers
+            },
+            "response_headers": {
+                name: response[name] for name in allowed_headers if name in response
+            },
+        }
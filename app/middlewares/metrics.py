@@ -0,0 +1,59 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from app.metrics import REQUEST_LATENCY, REQUEST_SIZE, RESPONSE_SIZE, DB_QUERIES
+
+
+class MetricsMiddleware:
+    """
+    Records latency, request/response sizes and query counts per route.
+
+    Routes are labelled with their URL pattern (e.g. "api/photos/<pk>/") rather
+    than the path, which keeps the number of series bounded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        started_at = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started_at)
+        return response
+
+    async def __acall__(self, request):
+        started_at = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started_at)
+        return response
+
+    def record(self, request, response, duration):
+        method = request.method
+        route = self.get_route(request)
+
+        REQUEST_LATENCY.labels(method, route, response.status_code).observe(duration)
+        REQUEST_SIZE.labels(method, route).observe(
+            int(request.META.get("CONTENT_LENGTH") or 0)
+        )
+        if not response.streaming:
+            RESPONSE_SIZE.labels(method, route).observe(len(response.content))
+
+        server_timing = getattr(request, "server_timing", None)
+        if server_timing is not None:
+            DB_QUERIES.labels(method, route).observe(server_timing.query_count)
+
+    def get_route(self, request):
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match is None:
+            return "unmatched"
+        return resolver_match.route
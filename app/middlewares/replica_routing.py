@@ -0,0 +1,70 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from app.db_router import use_replica, reset_replica
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sends reads of safe-method requests to the replicas and pins a client to the
+    primary for a short window after it writes, so it can read its own writes.
+
+    A client can also force primary reads with the X-Read-Primary header.
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+    PIN_HEADER = "X-Read-Primary"
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        token = use_replica(self.can_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_replica(token)
+
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        token = use_replica(self.can_use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_replica(token)
+
+        return self.process_response(request, response)
+
+    @classmethod
+    def can_use_replica(cls, request):
+        return request.method in cls.SAFE_METHODS and not cls.is_pinned(request)
+
+    def process_response(self, request, response):
+        # Views can tell whether an unsafe request wrote, e.g. a batch of reads
+        wrote = getattr(request, "wrote", request.method not in self.SAFE_METHODS)
+        if wrote and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE_NAME,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+
+        return response
+
+    @classmethod
+    def is_pinned(cls, request):
+        if request.headers.get(cls.PIN_HEADER, "").lower() in ("1", "true"):
+            return True
+        return settings.REPLICA_PIN_COOKIE_NAME in request.COOKIES
@@ -0,0 +1,164 @@
+import cProfile
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from app.server_timing import ServerTiming, start_timing, stop_timing
+
+
+logger = logging.getLogger("django")
+
+# Only one cProfile profiler can be active in a process on Python 3.12, where it
+# uses sys.monitoring; requests arriving while one is running go unprofiled
+profiling_lock = threading.Lock()
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a Server-Timing header with the auth, db, serialize and render phases.
+
+    A request carrying `X-Profile: <PROFILING_TOKEN>` is also run under cProfile
+    and the profile is saved under logs/profiles/, named in the X-Profile-File
+    response header. Open it with `python -m pstats` or snakeviz. One request is
+    profiled at a time per process, the header is missing from the others.
+    """
+
+    PROFILE_HEADER = "X-Profile"
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Django would otherwise run the sync hooks in a thread
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        server_timing, token, started_at = self.start(request)
+        profile = self.start_profile(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop_profile(profile)
+            stop_timing(token)
+
+        return self.finish(request, response, server_timing, started_at, profile)
+
+    async def __acall__(self, request):
+        server_timing, token, started_at = self.start(request)
+        # Profiles everything the event loop runs meanwhile, so best used on a
+        # quiet worker
+        profile = self.start_profile(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop_profile(profile)
+            stop_timing(token)
+
+        return self.finish(request, response, server_timing, started_at, profile)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.server_timing.start_view()
+
+    def process_template_response(self, request, response):
+        return self.time_render(request, response)
+
+    # process_view and process_template_response are replaced by these in async
+    # mode, so they must not call them
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        request.server_timing.start_view()
+
+    async def aprocess_template_response(self, request, response):
+        return self.time_render(request, response)
+
+    def time_render(self, request, response):
+        # Called between the view and response.render()
+        server_timing = request.server_timing
+        server_timing.end_view()
+        render_started_at = time.perf_counter()
+
+        def end_render(rendered_response):
+            server_timing.add("render", time.perf_counter() - render_started_at)
+
+        response.add_post_render_callback(end_render)
+        return response
+
+    def start(self, request):
+        server_timing = ServerTiming()
+        request.server_timing = server_timing
+        return server_timing, start_timing(server_timing), time.perf_counter()
+
+    def finish(self, request, response, server_timing, started_at, profile):
+        # Responses that were not template responses end the view here
+        server_timing.end_view()
+        response["Server-Timing"] = server_timing.header(
+            time.perf_counter() - started_at
+        )
+
+        if profile is not None:
+            response["X-Profile-File"] = self.save_profile(request, profile)
+
+        return response
+
+    def get_profile(self, request):
+        profiling_token = settings.PROFILING_TOKEN
+        header = request.headers.get(self.PROFILE_HEADER)
+        if not profiling_token or not header:
+            return None
+
+        if not hmac.compare_digest(header.encode(), profiling_token.encode()):
+            logger.warning(f"Rejected profiling request for {request.path}")
+            return None
+
+        return cProfile.Profile()
+
+    def start_profile(self, request):
+        """
+        Returns:
+            cProfile.Profile: The enabled profiler of a profiling request, or None
+            when the request isn't one or another profile is running.
+        """
+        profile = self.get_profile(request)
+        if profile is None:
+            return None
+
+        if not profiling_lock.acquire(blocking=False):
+            logger.warning(f"Not profiling {request.path}, a profile is running")
+            return None
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool, e.g. a debugger, is already active
+            profiling_lock.release()
+            logger.warning(f"Not profiling {request.path}, a profiler is active")
+            return None
+        return profile
+
+    def stop_profile(self, profile):
+        if profile is not None:
+            profile.disable()
+            profiling_lock.release()
+
+    def save_profile(self, request, profile):
+        profiles_dir = os.path.join(settings.BASE_DIR, "logs", "profiles")
+        os.makedirs(profiles_dir, exist_ok=True)
+
+        path = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-")
+        file_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{path}.prof"
+        profile.dump_stats(os.path.join(profiles_dir, file_name))
+
+        logger.info(f"Saved profile of {request.method} {request.path} to {file_name}")
+        return file_name
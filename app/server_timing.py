@@ -0,0 +1,102 @@
+"""
+Per-request timing of the auth, db, serialize and render phases.
+
+ServerTimingMiddleware installs a ServerTiming collector in a context variable for
+the duration of each request; code that wants to be measured wraps itself in
+`timing(name)`, and every database query is timed by an execute wrapper added to
+each connection as it is created. Outside of a request these are no-ops.
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_current_timing = ContextVar("server_timing", default=None)
+
+
+class ServerTiming:
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.query_count = 0
+        # Phase being timed; nested phases (e.g. the user query during auth) are
+        # booked to it, so the phases never overlap
+        self.active_phase = None
+        self.view_started_at = None
+        self.durations_at_view_start = None
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+
+    def start_view(self):
+        self.view_started_at = time.perf_counter()
+        self.durations_at_view_start = dict(self.durations)
+
+    def end_view(self):
+        """
+        Books the view's own time, i.e. everything but the queries, auth and
+        rendering it triggered, as "serialize".
+        """
+        if self.view_started_at is None:
+            return
+
+        elapsed = time.perf_counter() - self.view_started_at
+        for name in ("db", "auth", "render"):
+            elapsed -= self.durations[name] - self.durations_at_view_start.get(name, 0)
+
+        self.add("serialize", max(elapsed, 0))
+        self.view_started_at = None
+
+    def header(self, total):
+        phases = [
+            f"{name};dur={self.durations[name] * 1000:.2f}"
+            for name in ("auth", "db", "serialize", "render")
+            if name in self.durations
+        ]
+        return ", ".join(phases + [f"total;dur={total * 1000:.2f}"])
+
+
+def start_timing(server_timing):
+    return _current_timing.set(server_timing)
+
+
+def stop_timing(token):
+    _current_timing.reset(token)
+
+
+@contextmanager
+def timing(name):
+    server_timing = _current_timing.get()
+    if server_timing is None or server_timing.active_phase is not None:
+        yield
+        return
+
+    server_timing.active_phase = name
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        server_timing.add(name, time.perf_counter() - started_at)
+        server_timing.active_phase = None
+
+
+def time_query(execute, sql, params, many, context):
+    server_timing = _current_timing.get()
+    if server_timing is not None:
+        server_timing.query_count += 1
+
+    with timing("db"):
+        return execute(sql, params, many, context)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    # Connections are reused across reconnects, so only add the wrapper once
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(install_query_timer)
+for connection in connections.all(initialized_only=True):
+    install_query_timer(None, connection)
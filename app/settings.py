@@ -2,19 +2,18 @@ import os
 from pathlib import Path
 import dj_database_url
 from datetime import timedelta
-from .utils import get_log_file_path, get_current_date, custom_hash_function
-import time
-from logging.config import dictConfig
-import threading
+from .utils import get_log_file_path, custom_hash_function
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.environ.get("SECRET_KEY", "local")
-# DEBUG = os.environ.get("DEBUG", None) == "1"
-DEBUG = True
+# Turned off by the production server, app/gunicorn_conf.py
+DEBUG = os.environ.get("DEBUG", None) == "1"
 ALLOWED_HOSTS = ["*"]
 ENV = os.environ.get("ENV", "local")
+# Serve the homepage and shared-with-me lists from photos.async_views (ASGI)
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "0") == "1"
 
 INSTALLED_APPS = [
     "django.contrib.auth",
@@ -35,16 +34,21 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so it times the whole stack and logs requests rejected by auth
+    "app.middlewares.RequestResponseLoggingMiddleware",
+    "app.middlewares.MetricsMiddleware",
+    "app.middlewares.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "app.middlewares.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "app.middlewares.JWTAuthMiddleware",
+    "app.middlewares.AdmissionMiddleware",
     'django.contrib.auth.middleware.AuthenticationMiddleware',  # Ensure this line is present
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "app.middlewares.RequestResponseLoggingMiddleware",
 ]
 
 
@@ -70,6 +74,26 @@ WSGI_APPLICATION = "app.wsgi.application"
 
 DATABASES = {"default": dj_database_url.config()}
 
+# Comma separated read replicas, e.g. postgres://...@replica-1/db,postgres://...@replica-2/db
+REPLICA_DATABASE_URLS = [
+    url.strip()
+    for url in os.environ.get("REPLICA_DATABASE_URLS", "").split(",")
+    if url.strip()
+]
+for index, replica_url in enumerate(REPLICA_DATABASE_URLS):
+    DATABASES[f"replica_{index}"] = {
+        **dj_database_url.parse(replica_url),
+        # Tests run against the primary only; replicas mirror it
+        "TEST": {"MIRROR": "default"},
+    }
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["app.db_router.PrimaryReplicaRouter"]
+
+# Seconds a client keeps reading from the primary after a write
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+REPLICA_PIN_COOKIE_NAME = "read_primary"
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -101,6 +125,47 @@ SIMPLE_JWT = {
     "TOKEN_TYPE_CLAIM": "token_type",
 }
 
+# Verified tokens and their users are cached per process for up to
+# AUTH_CACHE_TTL seconds (0 disables it). Point AUTH_CACHE_ALIAS at a shared
+# cache to share entries and invalidations between workers. Without it, a user
+# deactivated or whose password changed in one worker stays cached in the others,
+# so the cache is off by default unless one process serves every request.
+AUTH_CACHE_ALIAS = os.environ.get("AUTH_CACHE_ALIAS") or None
+AUTH_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", 300 if AUTH_CACHE_ALIAS else 0))
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "rate_limits": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "rate-limits",
+        # A bucket per active user and endpoint class, evicted ones refill fully
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("RATE_LIMIT_CACHE_MAX_ENTRIES", 100000))
+        },
+    },
+}
+
+# Per-user token buckets by endpoint class, see app/admission.py: "rate" is the
+# sustained rate, "burst" the bucket size, and "upload" classes also count towards
+# MAX_CONCURRENT_UPLOADS uploads in progress per process
+RATE_LIMIT_CACHE_ALIAS = "rate_limits"
+RATE_LIMITS = {
+    "upload": {
+        "rate": os.environ.get("RATE_LIMIT_UPLOAD", "60/min"),
+        "burst": 20,
+        "upload": True,
+    },
+    "bulk_upload": {
+        "rate": os.environ.get("RATE_LIMIT_BULK_UPLOAD", "10/min"),
+        "burst": 3,
+        "upload": True,
+    },
+    "bulk": {"rate": os.environ.get("RATE_LIMIT_BULK", "30/min"), "burst": 10},
+    "export": {"rate": os.environ.get("RATE_LIMIT_EXPORT", "10/h"), "burst": 5},
+}
+MAX_CONCURRENT_UPLOADS = int(os.environ.get("MAX_CONCURRENT_UPLOADS", 8))
+
 LANGUAGE_CODE = "en-us"
 
 TIME_ZONE = "Asia/Kathmandu"
@@ -117,12 +182,43 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
 MEDIA_URL = "/media/"
+# Serve MEDIA_ROOT from the app, turn off when a proxy or CDN serves it
+SERVE_MEDIA = os.environ.get("SERVE_MEDIA", "1") == "1"
+
+# Rows removed per transaction by the background deletion pipeline
+DELETION_BATCH_SIZE = int(os.environ.get("DELETION_BATCH_SIZE", 500))
+# A deletion job without progress for this long is taken for abandoned and run
+# again, see photos.deletion
+DELETION_STALE_SECONDS = int(os.environ.get("DELETION_STALE_SECONDS", 600))
+# A contact sheet requested this long ago and still not rendered is taken for
+# lost and rendered again, see photos.contact_sheets
+CONTACT_SHEET_STALE_SECONDS = int(os.environ.get("CONTACT_SHEET_STALE_SECONDS", 300))
+# Seconds between checks for background work left by other workers, see
+# photos.recovery
+RECOVERY_INTERVAL = int(os.environ.get("RECOVERY_INTERVAL", 60))
+
+# Most sub-requests accepted by /api/batch in one request
+BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", 20))
+
+# Rows fetched per round trip by the server-side cursors of /api/export/
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+
+# Most changes read by one /api/sync request
+SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", 1000))
+# Days changes are kept for /api/sync, see the prune_changes command
+SYNC_RETENTION_DAYS = int(os.environ.get("SYNC_RETENTION_DAYS", 30))
+
+# How /api/events reaches streams in other processes: "local" (this process only)
+# or "postgres" (LISTEN/NOTIFY, needs a PostgreSQL default database)
+EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND", "local")
+# Seconds between keep-alive comments on idle /api/events streams
+EVENTS_HEARTBEAT_SECONDS = int(os.environ.get("EVENTS_HEARTBEAT_SECONDS", 25))
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "app.renderers.ORJSONRenderer",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
@@ -131,12 +227,16 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "app.pagination.PhotosAppPagination",
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'app.authentication.StatelessJWTAuthentication',
     ),
 }
 
 WATCHMAN_CHECKS = ("watchman.checks.caches", "watchman.checks.databases")
 
+# Prebuilt OpenAPI schema served at /api/schema, see the build_schema command
+OPENAPI_SCHEMA_FILE = os.environ.get(
+    "OPENAPI_SCHEMA_FILE", os.path.join(BASE_DIR, "openapi.json")
+)
 SPECTACULAR_SETTINGS = {
     "TITLE": "photos_app_backend",
     "VERSION": "1.0.0",
@@ -160,6 +260,8 @@ SPECTACULAR_SETTINGS = {
 
 CORS_ALLOW_ALL_ORIGINS = True 
 CORS_ALLOW_CREDENTIALS = True
+# Response headers scripts on other origins may read
+CORS_EXPOSE_HEADERS = ["Retry-After"]
 
 
 CORS_ALLOW_METHODS = [
@@ -180,6 +282,8 @@ CORS_ALLOW_HEADERS = [
     "user-agent",
     "x-csrftoken",
     "x-requested-with",
+    "x-read-primary",
+    "x-profile",
     'content-disposition',
     'Content-Disposition',
     'Content-Type',  # Add other headers as needed
@@ -187,6 +291,45 @@ CORS_ALLOW_HEADERS = [
 
 
 
+# /metrics requires the header "X-Metrics-Token: <METRICS_TOKEN>", and is
+# disabled while it is unset
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+
+# Readiness checks run in the background every HEALTH_PROBE_INTERVAL seconds; the
+# storage check fails when less than HEALTH_MIN_FREE_DISK_MB is left in MEDIA_ROOT
+HEALTH_PROBE_INTERVAL = int(os.environ.get("HEALTH_PROBE_INTERVAL", 10))
+HEALTH_MIN_FREE_DISK_MB = int(os.environ.get("HEALTH_MIN_FREE_DISK_MB", 1024))
+
+# Requests sent with "X-Profile: <PROFILING_TOKEN>" are profiled with cProfile and
+# the profile saved under logs/profiles/. Profiling is disabled when unset.
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN") or None
+
+# Access log: successful requests are sampled, errors and slow requests always
+# logged, and only the allow-listed headers are recorded
+ACCESS_LOG_SAMPLE_RATE = float(os.environ.get("ACCESS_LOG_SAMPLE_RATE", 1.0))
+ACCESS_LOG_SLOW_REQUEST_MS = int(os.environ.get("ACCESS_LOG_SLOW_REQUEST_MS", 1000))
+ACCESS_LOG_HEADERS = [
+    "user-agent",
+    "content-type",
+    "content-length",
+    "referer",
+    "x-forwarded-for",
+]
+
+# Every handler writes from its own listener thread (app.log_handlers), and the
+# file handlers rotate at midnight from there. Processes sharing the files, like
+# gunicorn workers, would each rotate them and overwrite each other's rotated
+# files: with LOG_ROTATE_EXTERNALLY the files are reopened once logrotate has
+# moved them away instead.
+LOG_ROTATE_EXTERNALLY = os.environ.get("LOG_ROTATE_EXTERNALLY", "0") == "1"
+if LOG_ROTATE_EXTERNALLY:
+    log_file_handler = {"handler_class": "logging.handlers.WatchedFileHandler"}
+else:
+    log_file_handler = {
+        "handler_class": "logging.handlers.TimedRotatingFileHandler",
+        "when": "midnight",
+        "backupCount": 30,  # Number of days to keep logs
+    }
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -199,18 +342,28 @@ LOGGING = {
             "format": "{levelname} {message}",
             "style": "{",
         },
+        "json": {
+            "()": "app.log_handlers.JSONFormatter",
+        },
     },
     "handlers": {
         "file": {
             "level": "INFO",
-            "class": "logging.handlers.TimedRotatingFileHandler",
-            "filename": get_log_file_path(BASE_DIR),
-            "when": "midnight",
-            "backupCount": 30,  # Number of days to keep logs
+            "()": "app.log_handlers.QueuedHandler",
+            **log_file_handler,
+            "filename": get_log_file_path(BASE_DIR, "django.log"),
             "formatter": "verbose",
         },
+        "access_file": {
+            "level": "INFO",
+            "()": "app.log_handlers.QueuedHandler",
+            **log_file_handler,
+            "filename": get_log_file_path(BASE_DIR, "access.log"),
+            "formatter": "json",
+        },
         "console": {
-            "class": "logging.StreamHandler",
+            "()": "app.log_handlers.QueuedHandler",
+            "handler_class": "logging.StreamHandler",
             "formatter": "verbose",
         },
     },
@@ -219,25 +372,11 @@ LOGGING = {
             "handlers": ["file", "console"],
             "level": "INFO",
             "propagate": True,
-        }
+        },
+        "access": {
+            "handlers": ["access_file", "console"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
-
-
-def update_logging_config_periodically(interval_hours):
-    while True:
-        update_logging_config()
-        time.sleep(interval_hours * 3600)
-
-
-def update_logging_config():
-    LOGGING["handlers"]["file"]["filename"] = get_log_file_path(BASE_DIR)
-    dictConfig(LOGGING)
-
-
-# Start a thread to update logging configuration periodically
-update_thread = threading.Thread(
-    target=update_logging_config_periodically, args=(1,)
-)  # Update every hour
-update_thread.daemon = True
-update_thread.start()
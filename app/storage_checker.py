@@ -0,0 +1,56 @@
+from django.conf import settings
+import logging
+import os
+import shutil
+import time
+
+logger = logging.getLogger("django")
+
+
+class StorageHealthChecker:
+    """
+    Wrapper class to check that uploads can be stored in MEDIA_ROOT.
+    """
+
+    @staticmethod
+    def check_health():
+        """
+        Writes, syncs and removes a small file in MEDIA_ROOT and checks the free
+        disk space left for uploads.
+
+        Returns:
+            dict: A dictionary with status information, the free space and the
+            write latency
+        """
+        media_root = settings.MEDIA_ROOT
+        probe_path = os.path.join(media_root, f".healthcheck-{os.getpid()}")
+
+        try:
+            os.makedirs(media_root, exist_ok=True)
+
+            started_at = time.perf_counter()
+            with open(probe_path, "wb") as probe_file:
+                probe_file.write(b"ok")
+                probe_file.flush()
+                os.fsync(probe_file.fileno())
+            os.remove(probe_path)
+            write_latency_ms = (time.perf_counter() - started_at) * 1000
+
+            free_bytes = shutil.disk_usage(media_root).free
+
+        except OSError as e:
+            error_message = str(e)
+            logger.error(f"Storage health check failed: {error_message}")
+            return {"status": "unhealthy", "error": error_message}
+
+        result = {
+            "status": "healthy",
+            "free_bytes": free_bytes,
+            "write_latency_ms": round(write_latency_ms, 3),
+        }
+        if free_bytes < settings.HEALTH_MIN_FREE_DISK_MB * 1024 * 1024:
+            result["status"] = "unhealthy"
+            result["error"] = "Not enough free disk space for uploads."
+            logger.error(f"Storage health check failed: {free_bytes} bytes free")
+
+        return result
@@ -1,7 +1,9 @@
-from django.urls import path, include
+import re
+from urllib.parse import urlsplit
+
+from django.urls import path, re_path, include
 from django.contrib import admin
 from drf_spectacular.views import (
-    SpectacularAPIView,
     SpectacularSwaggerView,
     SpectacularRedocView,
 )
@@ -12,13 +14,23 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
-from .views import HealthView
+from .schema import SchemaView
+from .views import (
+    HealthView,
+    LivenessView,
+    ReadinessView,
+    metrics_view,
+    serve_media,
+)
 
 
 urlpatterns = (
     [
         path("api/health", HealthView.as_view(), name="health-view"),
-        path("api/schema", SpectacularAPIView.as_view(), name="schema"),
+        path("api/health/live", LivenessView.as_view(), name="health-live"),
+        path("api/health/ready", ReadinessView.as_view(), name="health-ready"),
+        path("metrics", metrics_view, name="metrics"),
+        path("api/schema", SchemaView.as_view(), name="schema"),
         path(
             "api/docs",
             SpectacularSwaggerView.as_view(url_name="schema"),
@@ -34,6 +46,14 @@ urlpatterns = (
         path("api/", include("photos.urls")),
         path("admin/", admin.site.urls),
     ]
-    + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 )
+
+# Unless a proxy or CDN serves them, from a local MEDIA_URL
+if settings.SERVE_MEDIA and not urlsplit(settings.MEDIA_URL).netloc:
+    urlpatterns.append(
+        re_path(
+            rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.*)$",
+            serve_media,
+        )
+    )
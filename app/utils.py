@@ -7,9 +7,8 @@ def get_current_date():
     return datetime.now().strftime("%Y-%m-%d")
 
 
-def get_log_file_path(BASE_DIR):
-    current_date = get_current_date()
-    log_file_path = os.path.join(BASE_DIR, "logs", f"{current_date}.log")
+def get_log_file_path(BASE_DIR, file_name):
+    log_file_path = os.path.join(BASE_DIR, "logs", file_name)
     os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
 
     return log_file_path
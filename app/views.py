@@ -1,34 +1,114 @@
+from datetime import datetime, timezone
+import hmac
+import re
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.static import serve
 from rest_framework.views import APIView
 from rest_framework.response import Response
 import logging
 
-# Import the DatabaseHealthChecker
-from .db_checker import DatabaseHealthChecker
+from .health_prober import health_prober
+from .metrics import render_metrics
 
 logger = logging.getLogger("django")
 
+# Files stored under a hash of their content, see photos.models.photo_upload_to
+CONTENT_ADDRESSED_PATH = re.compile(r"/[0-9a-f]{16}/[^/]+$")
+
+
+class LivenessView(APIView):
+    """The process is up and serving requests; no dependency is checked."""
+
+    def get(self, request, format=None):
+        return Response({"status": "alive"})
+
+
+class ReadinessView(APIView):
+    """Serves the latest result of the background health probes."""
+
+    def get(self, request, format=None):
+        snapshot = health_prober.get_snapshot()
+        if snapshot is None:
+            return Response({"status": "starting"}, status=503)
+
+        checked_at, checks = snapshot
+        stale = health_prober.is_stale(snapshot)
+        healthy = not stale and all(
+            check["status"] == "healthy" for check in checks.values()
+        )
+
+        data = {
+            "status": "ready" if healthy else "not_ready",
+            "checked_at": datetime.fromtimestamp(checked_at, timezone.utc).isoformat(),
+            "checks": checks,
+        }
+        if stale:
+            data["error"] = "Health probes have not completed recently."
+
+        return Response(data, status=200 if healthy else 503)
+
 
 class HealthView(APIView):
     def get(self, request, format=None):
         # Check API health
         api_status = {"status": "healthy"}
-        
-        # Check database health
-        db_status = DatabaseHealthChecker.check_health()
-        
+
+        # Database and storage health come from the background prober
+        snapshot = health_prober.get_snapshot()
+        if snapshot is None or health_prober.is_stale(snapshot):
+            checks = {
+                "database": {"status": "unknown"},
+                "storage": {"status": "unknown"},
+            }
+        else:
+            checks = snapshot[1]
+        db_status = checks["database"]
+        storage_status = checks["storage"]
+
         # Construct the complete response
         data = {
             "api": api_status["status"],
-            "database": db_status["status"]
+            "database": db_status["status"],
+            "storage": storage_status["status"],
         }
-        
+
         # Add any error details if present
         if db_status["status"] == "unhealthy" and "error" in db_status:
             data["database_error"] = db_status["error"]
-        
-        logger.info(f"Health Check: API: {api_status['status']}, DB: {db_status['status']}")
-        
+        if storage_status["status"] == "unhealthy" and "error" in storage_status:
+            data["storage_error"] = storage_status["error"]
+
         # Determine HTTP status code based on health
-        status_code = 200 if all(value == "healthy" for value in [api_status["status"], db_status["status"]]) else 503
-        
-        return Response(data, status=status_code)
\ No newline at end of file
+        statuses = [api_status["status"], db_status["status"], storage_status["status"]]
+        status_code = 200 if all(value == "healthy" for value in statuses) else 503
+
+        return Response(data, status=status_code)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, aggregated over all worker processes. It is
+    outside the JWT middleware and only served with the METRICS_TOKEN.
+    """
+    token = settings.METRICS_TOKEN
+    if not token or not hmac.compare_digest(
+        request.headers.get("X-Metrics-Token", "").encode(), token.encode()
+    ):
+        return HttpResponse(status=403)
+
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
+
+
+def serve_media(request, path):
+    """
+    Serves uploaded files. A content-addressed file never changes, so the browser
+    may keep it for a year without revalidating. Media requires authentication,
+    so shared caches must not store it.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if CONTENT_ADDRESSED_PATH.search(path):
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
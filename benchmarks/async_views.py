@@ -0,0 +1,188 @@
+"""
+Compares the sync and async versions of the homepage and shared-with-me views.
+
+Each mode runs in its own process (ASYNC_VIEWS=0 / ASYNC_VIEWS=1) and drives the
+ASGI application in-process, so the numbers measure the Django stack at the given
+concurrency without any network or server overhead.
+
+Usage:
+    python benchmarks/async_views.py --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PATHS = [
+    "/api/homepage/",
+    "/api/share/received/photos/",
+    "/api/share/received/albums/",
+]
+
+
+def setup_django():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+    import django
+
+    django.setup()
+
+
+def get_or_create_fixture(email):
+    """Creates a user with a few owned and shared photos and albums."""
+    from django.contrib.auth.models import User
+    from photos.models import Photo, Album, Collaboration
+
+    user, created = User.objects.get_or_create(username=email, email=email)
+    if not created:
+        return user
+
+    friend, _ = User.objects.get_or_create(
+        username=f"friend-{email}", email=f"friend-{email}"
+    )
+    for owner in (user, friend):
+        photos = Photo.objects.bulk_create(
+            Photo(user=owner, image=f"photos/bench/{owner.id}-{i}.jpg", format="jpg")
+            for i in range(20)
+        )
+        for i in range(5):
+            album = Album.objects.create(
+                user=owner, name=f"Album {i}", cover_photo=photos[i]
+            )
+            album.photos.add(*photos[i * 4 : i * 4 + 4])
+
+    Collaboration.objects.bulk_create(
+        [
+            Collaboration(
+                shared_by=friend, shared_with=user, content_type="PHOTO", photo=photo
+            )
+            for photo in friend.photos.all()[:10]
+        ]
+        + [
+            Collaboration(
+                shared_by=friend, shared_with=user, content_type="ALBUM", album=album
+            )
+            for album in friend.albums.all()[:3]
+        ]
+    )
+    return user
+
+
+async def call(application, path, token):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"authorization", f"Bearer {token}".encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    status = None
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if body_sent:
+            # Django listens for a disconnect until the response is sent
+            await asyncio.Event().wait()
+        body_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await application(scope, receive, send)
+    return status
+
+
+async def run_load(application, token, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(index):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            status = await call(application, PATHS[index % len(PATHS)], token)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(total)))
+    return time.perf_counter() - started, sorted(latencies), errors
+
+
+def run_mode(args):
+    setup_django()
+
+    from django.conf import settings
+    from django.core.asgi import get_asgi_application
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    import logging
+
+    # Request logging would dominate the measurement
+    logging.disable(logging.CRITICAL)
+
+    user = get_or_create_fixture(args.email)
+    token = str(AccessToken.for_user(user))
+    application = get_asgi_application()
+
+    async def main():
+        # Warm up connections and URL resolution before measuring
+        await run_load(application, token, len(PATHS), 1)
+        return await run_load(application, token, args.requests, args.concurrency)
+
+    elapsed, latencies, errors = asyncio.run(main())
+    mode = "async" if settings.ASYNC_VIEWS else "sync"
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(
+        f"{mode:>5}: {args.requests / elapsed:8.1f} req/s  "
+        f"p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  errors {errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--email", default="benchmark@example.com")
+    parser.add_argument("--mode", choices=["sync", "async"])
+    args = parser.parse_args()
+
+    if args.mode:
+        os.environ["ASYNC_VIEWS"] = "1" if args.mode == "async" else "0"
+        run_mode(args)
+        return
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    for mode in ("sync", "async"):
+        subprocess.run(
+            [sys.executable, __file__, "--mode", mode]
+            + ["--requests", str(args.requests)]
+            + ["--concurrency", str(args.concurrency)]
+            + ["--email", args.email],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
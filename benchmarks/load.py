@@ -0,0 +1,338 @@
+"""
+Replays a mix of API requests at a given concurrency and reports latency
+percentiles, throughput and database queries per request.
+
+The requests are made as users of a dataset created by `manage.py generate_dataset`
+and drive the ASGI application in-process, like benchmarks/async_views.py, so
+queries can be counted per request. The rate limits of app/admission.py are
+lifted for the run. Save the results of a run with --output and pass them to
+--compare on another commit to print the differences.
+
+Usage:
+    python manage.py generate_dataset --users 1000 --photos 1000000
+    python benchmarks/load.py --mix browse --requests 5000 --concurrency 50 \\
+        --output before.json
+    python benchmarks/load.py --mix browse --requests 5000 --concurrency 50 \\
+        --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Weight, name and path of each request, filled in with the user's photo, album
+# and sync cursor
+MIXES = {
+    "browse": [
+        (4, "homepage", "/api/homepage/"),
+        (3, "photos", "/api/photos/"),
+        (2, "photo", "/api/photos/{photo}/"),
+        (2, "albums", "/api/albums/"),
+        (2, "album", "/api/albums/{album}/"),
+        (1, "received photos", "/api/share/received/photos/"),
+        (1, "received albums", "/api/share/received/albums/"),
+    ],
+    "shared": [
+        (2, "received photos", "/api/share/received/photos/"),
+        (2, "received albums", "/api/share/received/albums/"),
+        (1, "sent", "/api/share/"),
+    ],
+    "sync": [
+        (3, "sync", "/api/sync?since={cursor}"),
+        (1, "homepage", "/api/homepage/"),
+    ],
+    "export": [
+        (1, "export", "/api/export/"),
+    ],
+}
+PERCENTILES = (50, 95, 99)
+# Rate and burst of every rate limit while benchmarking
+UNLIMITED = 10**9
+
+# Queries of the request being made, counted across the threads it runs in
+_query_count = ContextVar("query_count", default=None)
+
+
+def setup_django():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+    import django
+    from django.conf import settings
+
+    # A few users replay thousands of requests, which the rate limits would mostly
+    # reject. Admission control still runs, it just never says no.
+    settings.RATE_LIMITS = {
+        scope: {**limit, "rate": f"{UNLIMITED}/s", "burst": UNLIMITED}
+        for scope, limit in settings.RATE_LIMITS.items()
+    }
+    settings.MAX_CONCURRENT_UPLOADS = UNLIMITED
+    django.setup()
+
+
+def count_query(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def get_actors(prefix, count, rng):
+    """
+    Returns:
+        list: Access token, photo, album and sync cursor of `count` users picked
+        at random among those of the dataset owning an album.
+    """
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from photos.models import Album
+    from photos.sync import current_cursor
+
+    user_ids = list(
+        User.objects.filter(username__startswith=f"{prefix}-", albums__isnull=False)
+        .distinct()
+        .values_list("id", flat=True)
+    )
+    if not user_ids:
+        sys.exit(f"No {prefix}-* users, run manage.py generate_dataset first.")
+
+    actors = []
+    for user in User.objects.filter(
+        id__in=rng.sample(user_ids, min(count, len(user_ids)))
+    ):
+        album = Album.objects.filter(user=user).order_by("?").first()
+        actors.append(
+            {
+                "token": str(AccessToken.for_user(user)),
+                "photo": album.cover_photo_id,
+                "album": album.id,
+                "cursor": current_cursor(user),
+            }
+        )
+    return actors
+
+
+async def call(application, path, token):
+    path, _, query_string = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"authorization", f"Bearer {token}".encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    status = None
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if body_sent:
+            # Django listens for a disconnect until the response is sent
+            await asyncio.Event().wait()
+        body_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await application(scope, receive, send)
+    return status
+
+
+async def run_load(application, requests, concurrency):
+    """
+    Returns:
+        tuple: The elapsed seconds, and the latencies, query counts and errors of
+        each request name.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results = defaultdict(lambda: {"latencies": [], "queries": [], "errors": 0})
+
+    async def one(name, path, actor):
+        async with semaphore:
+            counter = [0]
+            _query_count.set(counter)
+            started = time.perf_counter()
+            status = await call(application, path.format(**actor), actor["token"])
+            result = results[name]
+            result["latencies"].append(time.perf_counter() - started)
+            result["queries"].append(counter[0])
+            if status != 200:
+                result["errors"] += 1
+
+    started = time.perf_counter()
+    # Each request runs in its own task, with its own query counter
+    await asyncio.gather(*(one(*request) for request in requests))
+    return time.perf_counter() - started, results
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of sorted values."""
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+def summarize(latencies, queries, errors, elapsed=None):
+    latencies = sorted(latencies)
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "queries": sum(queries) / len(queries),
+        "max_queries": max(queries),
+    }
+    for percent in PERCENTILES:
+        summary[f"p{percent}_ms"] = percentile(latencies, percent) * 1000
+    if elapsed is not None:
+        summary["throughput"] = len(latencies) / elapsed
+    return summary
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_row(name, summary, previous=None):
+    columns = [f"{name:>16}", f"{summary['requests']:6}"]
+    for key in [f"p{percent}_ms" for percent in PERCENTILES] + ["queries"]:
+        value = f"{summary[key]:8.1f}"
+        if previous and previous.get(key):
+            value += f" {(summary[key] / previous[key] - 1) * 100:+5.0f}%"
+        columns.append(value)
+    columns.append(f"{summary['errors']:6}")
+    return "  ".join(columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mix", choices=MIXES, default="browse")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=100, help="Users to act as")
+    parser.add_argument("--prefix", default="synthetic", help="Dataset user prefix")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Results of an earlier run to compare to")
+    args = parser.parse_args()
+
+    setup_django()
+
+    import logging
+
+    from django.conf import settings
+    from django.core.asgi import get_asgi_application
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    # Request logging would dominate the measurement
+    logging.disable(logging.CRITICAL)
+    connection_created.connect(install_query_counter)
+    for connection in connections.all(initialized_only=True):
+        install_query_counter(None, connection)
+
+    rng = random.Random(args.seed)
+    actors = get_actors(args.prefix, args.users, rng)
+    mix = MIXES[args.mix]
+    requests = [
+        (name, path, rng.choice(actors))
+        for _, name, path in rng.choices(
+            mix, weights=[weight for weight, _, _ in mix], k=args.requests
+        )
+    ]
+    application = get_asgi_application()
+
+    async def run():
+        # Warm up connections and URL resolution before measuring
+        warm_up = [(name, path, actors[0]) for _, name, path in mix]
+        await run_load(application, warm_up, 1)
+        return await run_load(application, requests, args.concurrency)
+
+    elapsed, results = asyncio.run(run())
+
+    everything = {"latencies": [], "queries": [], "errors": 0}
+    endpoints = {}
+    for name, result in sorted(results.items()):
+        endpoints[name] = summarize(**result)
+        for key in ("latencies", "queries"):
+            everything[key] += result[key]
+        everything["errors"] += result["errors"]
+    report = {
+        "commit": get_commit(),
+        "mix": args.mix,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "async_views": settings.ASYNC_VIEWS,
+        "database": connections["default"].vendor,
+        "total": summarize(**everything, elapsed=elapsed),
+        "endpoints": endpoints,
+    }
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+        print(f"Compared to {previous.get('commit')} ({args.compare})")
+
+    previous_endpoints = previous.get("endpoints", {})
+    print(
+        f"{args.requests} requests, mix {args.mix}, concurrency {args.concurrency}, "
+        f"commit {report['commit']}"
+    )
+    print(
+        "  ".join(
+            [f"{'endpoint':>16}", f"{'count':>6}"]
+            + [f"{f'p{percent} ms':>8}" for percent in PERCENTILES]
+            + [f"{'queries':>8}", f"{'errors':>6}"]
+        )
+    )
+    for name, summary in endpoints.items():
+        print(format_row(name, summary, previous_endpoints.get(name)))
+    print(format_row("all", report["total"], previous.get("total")))
+
+    throughput = report["total"]["throughput"]
+    line = f"Throughput {throughput:.1f} req/s"
+    if previous.get("total"):
+        change = throughput / previous["total"]["throughput"] - 1
+        line += f" ({change * 100:+.0f}%)"
+    print(line)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
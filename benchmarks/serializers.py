@@ -0,0 +1,159 @@
+"""
+Compares the list serializers: ModelSerializer + JSONRenderer against
+ValuesListSerializer + ORJSONRenderer.
+
+Every run loads the rows from the database, serializes and renders them, which is
+what a list endpoint does for each page, and reports rows per second.
+
+Usage:
+    python benchmarks/serializers.py --rows 2000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+    import django
+
+    django.setup()
+
+
+def get_or_create_fixture(email, rows):
+    """Creates a user owning `rows` photos, albums and shares."""
+    from django.contrib.auth.models import User
+    from photos.models import Photo, Album, Collaboration
+
+    user, _ = User.objects.get_or_create(username=email, email=email)
+    friend, _ = User.objects.get_or_create(
+        username=f"friend-{email}", email=f"friend-{email}"
+    )
+    if user.photos.count() >= rows:
+        return user
+
+    user.photos.all().delete()
+    user.albums.all().delete()
+    photos = Photo.objects.bulk_create(
+        Photo(
+            user=user,
+            image=f"photos/bench/{user.id}-{i}.jpg",
+            format="jpg",
+            metadata={"camera": "bench", "index": i},
+        )
+        for i in range(rows)
+    )
+    albums = Album.objects.bulk_create(
+        Album(user=user, name=f"Album {i}", cover_photo=photos[i]) for i in range(rows)
+    )
+    Album.photos.through.objects.bulk_create(
+        Album.photos.through(album_id=album.id, photo_id=photos[(i + 1) % rows].id)
+        for i, album in enumerate(albums)
+    )
+    Collaboration.objects.bulk_create(
+        Collaboration(
+            shared_by=user,
+            shared_with=friend,
+            content_type="PHOTO" if i % 2 else "ALBUM",
+            photo=photos[i] if i % 2 else None,
+            album=None if i % 2 else albums[i],
+        )
+        for i in range(rows)
+    )
+    return user
+
+
+def measure(function, rows, repeat):
+    """Returns the best rows per second over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--email", default="serializers-benchmark@example.com")
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.test import RequestFactory
+    from rest_framework.renderers import JSONRenderer
+
+    from app.renderers import ORJSONRenderer
+    from photos.models import Photo, Album, Collaboration
+    from photos.serializers import (
+        PhotoSerializer,
+        AlbumSerializer,
+        CollaborationSerializer,
+        PhotoListSerializer,
+        AlbumListSerializer,
+        CollaborationListSerializer,
+    )
+
+    user = get_or_create_fixture(args.email, args.rows)
+    request = RequestFactory().get("/api/", HTTP_HOST="benchmark")
+    request.user = user
+    context = {"request": request}
+
+    cases = [
+        (
+            "photos",
+            Photo.objects.filter(user=user),
+            PhotoSerializer,
+            PhotoListSerializer,
+        ),
+        (
+            "albums",
+            Album.objects.filter(user=user)
+            .select_related("cover_photo")
+            .with_photo_count(),
+            AlbumSerializer,
+            AlbumListSerializer,
+        ),
+        (
+            "collaborations",
+            Collaboration.objects.filter(shared_by=user).select_related(
+                "shared_by", "shared_with", "photo", "album__cover_photo"
+            ),
+            CollaborationSerializer,
+            CollaborationListSerializer,
+        ),
+    ]
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    for name, queryset, serializer_class, list_serializer_class in cases:
+
+        def model_serializer():
+            data = serializer_class(queryset.all(), many=True, context=context).data
+            return JSONRenderer().render(data)
+
+        def values_serializer():
+            serializer = list_serializer_class(context)
+            return ORJSONRenderer().render(
+                serializer.serialize(serializer.get_rows(queryset.all()))
+            )
+
+        assert model_serializer() == values_serializer(), f"{name} output differs"
+
+        before = measure(model_serializer, args.rows, args.repeat)
+        after = measure(values_serializer, args.rows, args.repeat)
+        print(
+            f"{name:>14}: {before:9.0f} -> {after:9.0f} rows/s  "
+            f"({after / before:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,121 @@
 from django.contrib import admin
+from django.contrib.admin.options import IS_POPUP_VAR, TO_FIELD_VAR
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 from .models import Photo, Album, Collaboration
 
+# Below this many rows counting them is cheap enough to do exactly
+ESTIMATE_THRESHOLD = 100_000
+# Query parameters of the change list that don't filter it
+UNFILTERED_PARAMS = {PAGE_VAR, ORDER_VAR, IS_POPUP_VAR, TO_FIELD_VAR}
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts the rows of an unfiltered change list with PostgreSQL's estimate of
+    the table's size, instead of a count over the whole table.
+    """
+
+    def __init__(self, *args, estimate=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimate = estimate
+
+    @cached_property
+    def count(self):
+        if self.estimate:
+            estimate = get_estimated_count(self.object_list)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+def get_estimated_count(queryset):
+    """
+    Returns:
+        int: The estimated number of rows in the queryset's table, or None when
+        the database keeps no estimate.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # -1 until the table is first vacuumed or analyzed
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Admin of a table with millions of rows. The unfiltered change list and its
+    searches are served by indexes:
+    - Rows are ordered by ID, and counted with an estimate when not filtered.
+    - Search matches the ID, or the ID of the user with that exact username in
+      the foreign keys of `search_fields`, instead of a substring of every row.
+    - Related objects are picked by ID or autocompleted, not listed in a select.
+    Lists filtered by `list_filter` are counted exactly, and the filtered columns
+    are not indexed: on large tables prefer searching.
+    """
+
+    paginator = EstimatedCountPaginator
+    # No count over the whole table next to the filtered one
+    show_full_result_count = False
+    ordering = ("-id",)
+    search_help_text = "An ID, or an exact username."
+
+    def get_paginator(self, request, queryset, per_page, **kwargs):
+        estimate = set(request.GET) <= UNFILTERED_PARAMS
+        return self.paginator(queryset, per_page, estimate=estimate, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        # Conditions on columns of this table only, so each one uses its index
+        query = Q(pk=search_term) if search_term.isdigit() else Q(pk__in=[])
+        user_id = (
+            User.objects.filter(username=search_term)
+            .values_list("id", flat=True)
+            .first()
+        )
+        if user_id is not None:
+            for field in self.get_search_fields(request):
+                query |= Q(**{field: user_id})
+        return queryset.filter(query), False
+
 
 @admin.register(Photo)
-class PhotoAdmin(admin.ModelAdmin):
+class PhotoAdmin(LargeTableAdmin):
     list_display = ("id", "user", "format", "is_bookmarked", "created_at")
-    list_filter = ("is_bookmarked", "format", "created_at")
-    search_fields = ("user__username", "metadata")
-    date_hierarchy = "created_at"
+    list_filter = ("is_bookmarked", "created_at")
+    list_select_related = ("user",)
+    search_fields = ("user_id",)
+    autocomplete_fields = ("user",)
 
 
 @admin.register(Album)
-class AlbumAdmin(admin.ModelAdmin):
+class AlbumAdmin(LargeTableAdmin):
     list_display = ("id", "name", "user", "created_at")
     list_filter = ("created_at",)
-    search_fields = ("name", "description", "user__username")
-    date_hierarchy = "created_at"
-    filter_horizontal = ("photos",)
+    list_select_related = ("user",)
+    search_fields = ("user_id",)
+    autocomplete_fields = ("user",)
+    raw_id_fields = ("cover_photo", "photos")
 
 
 @admin.register(Collaboration)
-class CollaborationAdmin(admin.ModelAdmin):
+class CollaborationAdmin(LargeTableAdmin):
     list_display = (
         "id",
         "content_type",
@@ -31,14 +126,16 @@ class CollaborationAdmin(admin.ModelAdmin):
         "created_at",
     )
     list_filter = ("content_type", "permission", "created_at")
-    search_fields = ("shared_by__username", "shared_with__username", "message")
-    date_hierarchy = "created_at"
-    
+    list_select_related = ("shared_by", "shared_with", "album")
+    search_fields = ("shared_by_id", "shared_with_id")
+    autocomplete_fields = ("shared_by", "shared_with")
+    raw_id_fields = ("photo", "album")
+
     def get_shared_item(self, obj):
         """Display the shared item (photo or album) based on content_type"""
         if obj.content_type == "PHOTO":
-            return f"Photo: {obj.photo.id}" if obj.photo else "None"
+            return f"Photo: {obj.photo_id}" if obj.photo_id else "None"
         else:
             return f"Album: {obj.album.name}" if obj.album else "None"
-    
-    get_shared_item.short_description = "Shared Item"
\ No newline at end of file
+
+    get_shared_item.short_description = "Shared Item"
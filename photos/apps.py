@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class PhotosConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "photos"
+
+    def ready(self):
+        # Connect the signal receivers
+        from . import signals  # noqa: F401
+
+        # Time every query from the first connection on, for Server-Timing
+        import app.server_timing  # noqa: F401
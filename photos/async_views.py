@@ -0,0 +1,231 @@
+"""
+Native async versions of the read-heavy endpoints.
+
+They are served instead of their synchronous counterparts in `photos.views` when
+`settings.ASYNC_VIEWS` is enabled. Under ASGI they run on the event loop, and
+only their queries, not the whole view, are handed to a thread. ASGIHandler gives
+each request its own thread for them, so the queries of a request run one at a
+time, while those of different requests run concurrently.
+"""
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from app.auth_cache import token_cache
+from app.renderers import ORJSONRenderer
+from app.pagination import PhotosAppPagination
+from app.server_timing import timing
+from .models import Photo, Album
+from .versions import aget_library_version, conditional_response, set_validators
+from .serializers import (
+    PhotoListSerializer,
+    AlbumListSerializer,
+    HomePagePhotoSerializer,
+    HomePageAlbumSerializer,
+)
+
+
+async def fetch_all(queryset):
+    return [obj async for obj in queryset]
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of DRF's APIView for authenticated read endpoints.
+
+    Reuses the JWT verified by JWTAuthMiddleware and the user from the token
+    cache, or loads the user with the async ORM, then renders the handler's data
+    with the API's renderer so the payload is byte-for-byte what the synchronous
+    views return.
+    """
+
+    authentication = JWTAuthentication()
+    renderer = ORJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Authenticated by token, not by session cookie, so like APIView.as_view()
+        # there is no CSRF check
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        with timing("auth"):
+            user = await self.authenticate(request)
+        if user is None:
+            return self.render(
+                {"detail": "Authentication credentials were not provided."},
+                status=401,
+            )
+
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def authenticate(self, request):
+        # Verified once by JWTAuthMiddleware; only verify here if it was skipped
+        validated_token = getattr(request, "validated_token", None)
+        if validated_token is None:
+            validated_token = self.get_validated_token(request)
+        if validated_token is None:
+            return None
+
+        cached_user = getattr(request, "cached_user", None)
+        if cached_user is not None:
+            return cached_user
+
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            return None
+
+        user = await User.objects.filter(
+            **{jwt_settings.USER_ID_FIELD: user_id}, is_active=True
+        ).afirst()
+        if user is not None:
+            token_cache.set(validated_token, user)
+        return user
+
+    def get_validated_token(self, request):
+        header = self.authentication.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        try:
+            return self.authentication.get_validated_token(raw_token)
+        except (InvalidToken, TokenError):
+            return None
+
+    def render(self, data, status=200):
+        with timing("render"):
+            content = self.renderer.render(data)
+
+        return HttpResponse(
+            content, content_type=self.renderer.media_type, status=status
+        )
+
+
+class AsyncListView(AsyncAPIView):
+    """
+    Async ListAPIView: awaits the COUNT, then the page query, and returns the
+    same envelope as PhotosAppPagination, serialized from values_list() rows by
+    the ValuesListSerializer in `list_serializer_class`.
+    """
+
+    queryset = None
+    list_serializer_class = None
+
+    def get_queryset(self):
+        # A fresh queryset per request, like GenericAPIView's
+        return self.queryset.all()
+
+    async def get(self, request, *args, **kwargs):
+        library_version = await aget_library_version(request.user)
+        not_modified = conditional_response(request, library_version)
+        if not_modified is not None:
+            return set_validators(not_modified, library_version)
+
+        serializer = self.list_serializer_class(context={"request": request})
+        queryset = serializer.get_rows(self.get_queryset())
+
+        paginator = PhotosAppPagination()
+        paginator.request = Request(request)
+        paginator.limit = paginator.get_limit(paginator.request)
+        paginator.offset = paginator.get_offset(paginator.request)
+
+        paginator.count = await queryset.acount()
+        page = await fetch_all(
+            queryset[paginator.offset : paginator.offset + paginator.limit]
+        )
+
+        response = self.render(
+            {
+                "count": paginator.count,
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                "results": serializer.serialize(page),
+            }
+        )
+        return set_validators(response, library_version)
+
+
+class AsyncSharedWithMePhotosView(AsyncListView):
+    list_serializer_class = PhotoListSerializer
+
+    def get_queryset(self):
+        return Photo.objects.filter(
+            collaborations__shared_with=self.request.user,
+            collaborations__content_type="PHOTO",
+        ).distinct()
+
+
+class AsyncSharedWithMeAlbumsView(AsyncListView):
+    list_serializer_class = AlbumListSerializer
+
+    def get_queryset(self):
+        return (
+            Album.objects.filter(
+                collaborations__shared_with=self.request.user,
+                collaborations__content_type="ALBUM",
+            )
+            .distinct()
+        )
+
+
+class AsyncHomePageView(AsyncAPIView):
+    async def get(self, request):
+        library_version = await aget_library_version(request.user)
+        not_modified = conditional_response(request, library_version)
+        if not_modified is not None:
+            return set_validators(not_modified, library_version)
+
+        # Get user's own photos and photos shared with the user
+        user_photos = Photo.objects.filter(user=request.user)
+        shared_photos = Photo.objects.filter(
+            collaborations__shared_with=request.user,
+            collaborations__content_type="PHOTO",
+        )
+        all_photos = (
+            (user_photos | shared_photos)
+            .distinct()
+            .select_related("user")
+            .order_by("-created_at")[:10]
+        )
+
+        # Get user's own albums and albums shared with the user
+        user_albums = Album.objects.filter(user=request.user)
+        shared_albums = Album.objects.filter(
+            collaborations__shared_with=request.user,
+            collaborations__content_type="ALBUM",
+        )
+        # Everything the serializer reads is loaded up front, so serialization
+        # below never has to go back to the database
+        all_albums = (
+            (user_albums | shared_albums)
+            .distinct()
+            .select_related("user", "cover_photo__user")
+            .prefetch_related("photos__user")
+            .order_by("-created_at")[:5]
+        )
+
+        photos = await fetch_all(all_photos)
+        albums = await fetch_all(all_albums)
+
+        photo_serializer = HomePagePhotoSerializer(
+            photos, many=True, context={"request": request}
+        )
+        album_serializer = HomePageAlbumSerializer(
+            albums, many=True, context={"request": request}
+        )
+
+        response = self.render(
+            {"photos": photo_serializer.data, "albums": album_serializer.data}
+        )
+        return set_validators(response, library_version)
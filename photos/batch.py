@@ -0,0 +1,173 @@
+"""
+/api/batch: several API requests in one round trip.
+
+The sub-requests are authenticated once, with the batch request, and dispatched
+in-process to their views through the URL resolver, skipping the middleware.
+Consecutive GETs don't depend on each other, so they run concurrently; any other
+method runs alone, in order, so later sub-requests see its writes. Rate limits
+apply to each sub-request as if it had been sent on its own.
+"""
+import asyncio
+import logging
+from io import BytesIO
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+import orjson
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.handlers.exception import response_for_exception
+from django.db import close_old_connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+from app.admission import admission, get_limit_scope
+from app.db_router import reset_replica, use_replica
+from app.middlewares.replica_routing import ReplicaRoutingMiddleware
+from .async_views import AsyncAPIView
+from .serializers import BatchSerializer
+
+logger = logging.getLogger("django")
+
+
+class SubResponse(NamedTuple):
+    """Status and body of a sub-request, as they appear in the batch envelope."""
+
+    status: int
+    body: object = None
+
+    @classmethod
+    def from_response(cls, response):
+        if response.streaming:
+            return cls(400, {"detail": "Streaming responses can't be batched."})
+
+        content = response.content
+        if not content:
+            return cls(response.status_code)
+        if response.get("Content-Type", "").startswith("application/json"):
+            # Already rendered, embedded as is
+            return cls(response.status_code, orjson.Fragment(content))
+        return cls(response.status_code, content.decode(response.charset))
+
+
+class BatchView(AsyncAPIView):
+    async def post(self, request):
+        try:
+            data = orjson.loads(request.body)
+        except orjson.JSONDecodeError:
+            return self.render({"detail": "Invalid JSON."}, status=400)
+
+        serializer = BatchSerializer(data=data)
+        if not serializer.is_valid():
+            return self.render(serializer.errors, status=400)
+
+        responses = []
+        # The replicas may lag behind the writes of earlier sub-requests
+        read_primary = False
+        reads = []
+        for sub_request in serializer.validated_data["requests"]:
+            if sub_request["method"] == "GET":
+                reads.append(sub_request)
+                continue
+
+            responses += await self.dispatch_reads(request, reads, read_primary)
+            reads = []
+            response = await self.dispatch_one(request, sub_request, read_primary)
+            read_primary = read_primary or response.status < 400
+            responses.append(response)
+        responses += await self.dispatch_reads(request, reads, read_primary)
+
+        # Pins the client to the primary only when something was written
+        request.wrote = read_primary
+        return self.render(
+            {"responses": [response._asdict() for response in responses]}
+        )
+
+    async def dispatch_reads(self, request, sub_requests, read_primary):
+        return await asyncio.gather(
+            *(
+                self.dispatch_one(request, sub_request, read_primary, concurrent=True)
+                for sub_request in sub_requests
+            )
+        )
+
+    async def dispatch_one(self, request, sub_request, read_primary, concurrent=False):
+        method, path = sub_request["method"], sub_request["path"]
+        url = urlsplit(path)
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return SubResponse(404, {"detail": "Not found."})
+
+        scope = get_limit_scope(url.path, method)
+        if scope is not None:
+            rejection = admission.admit(scope, f"user:{request.user.id}")
+            if rejection is not None:
+                return SubResponse(rejection.status, {"detail": rejection.detail})
+
+        sub = build_request(request, method, url, sub_request["body"])
+        sub.resolver_match = match
+        token = use_replica(
+            not read_primary and ReplicaRoutingMiddleware.can_use_replica(sub)
+        )
+        try:
+            if iscoroutinefunction(match.func):
+                response = await call_async_view(match, sub)
+            else:
+                # Concurrent reads each get a thread, and a connection, of their own
+                response = await sync_to_async(
+                    call_view, thread_sensitive=not concurrent
+                )(match, sub, close_connections=concurrent)
+        finally:
+            reset_replica(token)
+            if scope is not None and admission.is_upload(scope):
+                admission.release_upload()
+
+        logger.info(f"Batched {method} {path} {response.status_code}")
+        return SubResponse.from_response(response)
+
+
+def build_request(request, method, url, body):
+    """Copies the batch request, with the method, URL and body of a sub-request."""
+    content = b"" if body is None else orjson.dumps(body)
+
+    sub = HttpRequest()
+    sub.method = method
+    sub.path = sub.path_info = url.path
+    sub.META = {
+        **request.META,
+        "REQUEST_METHOD": method,
+        "PATH_INFO": url.path,
+        "QUERY_STRING": url.query,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(content)),
+    }
+    sub.GET = QueryDict(url.query)
+    sub.COOKIES = request.COOKIES
+    sub._stream = BytesIO(content)
+    sub._read_started = False
+
+    # Authenticated once, see JWTAuthMiddleware and StatelessJWTAuthentication
+    sub.user = sub.cached_user = request.user
+    sub.validated_token = getattr(request, "validated_token", None)
+    sub.server_timing = request.server_timing
+    return sub
+
+
+def call_view(match, request, close_connections=False):
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+    except Exception as exc:
+        return response_for_exception(request, exc)
+    finally:
+        if close_connections:
+            close_old_connections()
+
+
+async def call_async_view(match, request):
+    try:
+        return await match.func(request, *match.args, **match.kwargs)
+    except Exception as exc:
+        return await sync_to_async(response_for_exception)(request, exc)
@@ -0,0 +1,209 @@
+"""
+Album contact sheets: thumbnails of an album's first photos in a single image.
+
+The homepage draws each album as a grid of previews, which costs one image request
+per preview. A contact sheet holds up to MAX_TILES of them, the cover first, in a
+grid of TILE_SIZE squares, with the position of each photo in
+`Album.contact_sheet_layout`, so an album takes one request.
+
+Sheets are rendered on a background thread after the album's photos or cover
+change. A sheet is only rendered again when the photos it shows changed, and it is
+stored under a hash of its content like photos are, so it is cached for good.
+
+The request for a render is saved with the change, in
+`Album.contact_sheet_requested_at`, and cleared by the render, so renders lost
+with a recycled worker are picked up by photos.recovery.
+"""
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Photo, Album, content_addressed_path
+from .versions import album_audience, bump_users
+
+logger = logging.getLogger("django")
+
+TILE_SIZE = 128
+MAX_TILES = 9
+
+# One worker: renders of the same album never race, the last one queued wins
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="contact-sheet")
+# Albums queued and not yet started, so bursts of changes render once
+queued = set()
+lock = threading.Lock()
+
+
+def schedule(album_ids):
+    """Renders the albums' sheets again once the current transaction commits."""
+    album_ids = set(album_ids)
+    if album_ids:
+        Album.all_objects.filter(id__in=album_ids).update(
+            contact_sheet_requested_at=timezone.now()
+        )
+        transaction.on_commit(lambda: submit(album_ids))
+
+
+def schedule_for_photos(photo_ids):
+    """Renders the sheets showing the photos, e.g. after they were hidden."""
+    schedule(albums_showing(photo_ids))
+
+
+def albums_showing(photo_ids):
+    album_ids = set(
+        Album.photos.through.objects.filter(photo_id__in=photo_ids).values_list(
+            "album_id", flat=True
+        )
+    )
+    album_ids.update(
+        Album.all_objects.filter(cover_photo_id__in=photo_ids).values_list(
+            "id", flat=True
+        )
+    )
+    return album_ids
+
+
+def pending_albums():
+    """Albums whose requested sheet should have been rendered by now."""
+    stale = timezone.now() - timedelta(seconds=settings.CONTACT_SHEET_STALE_SECONDS)
+    return Album.objects.filter(contact_sheet_requested_at__lt=stale)
+
+
+def resume_renders():
+    """Queues the renders that the process requesting them didn't finish."""
+    submit(set(pending_albums().values_list("id", flat=True)))
+
+
+def submit(album_ids):
+    with lock:
+        album_ids = album_ids - queued
+        queued.update(album_ids)
+    for album_id in album_ids:
+        executor.submit(run, album_id)
+
+
+def run(album_id):
+    """Renders a sheet on the background thread and releases its DB connection."""
+    with lock:
+        # Changes made from now on queue the album again
+        queued.discard(album_id)
+    close_old_connections()
+    try:
+        render_contact_sheet(album_id)
+    except Exception:
+        logger.exception(f"Could not render the contact sheet of album {album_id}")
+    finally:
+        close_old_connections()
+
+
+def get_sheet_photos(album):
+    """
+    Returns:
+        list: The ID and image of the photos on the sheet: the cover, then the
+        latest photos of the album.
+    """
+    photos = []
+    if album.cover_photo_id is not None:
+        photos += Photo.objects.filter(id=album.cover_photo_id).values_list(
+            "id", "image"
+        )
+    photos += (
+        Photo.objects.filter(albums=album)
+        .exclude(id=album.cover_photo_id)
+        .order_by("-created_at", "-id")
+        .values_list("id", "image")[: MAX_TILES - len(photos)]
+    )
+    return photos
+
+
+def make_thumbnail(name):
+    storage = Photo._meta.get_field("image").storage
+    with storage.open(name) as file, Image.open(file) as image:
+        # JPEGs are decoded at the smallest scale still larger than a tile
+        image.draft("RGB", (TILE_SIZE, TILE_SIZE))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        return ImageOps.fit(image, (TILE_SIZE, TILE_SIZE))
+
+
+def render_contact_sheet(album_id):
+    album = Album.objects.filter(id=album_id).first()
+    if album is None:
+        # Deleted or waiting for deletion
+        return
+
+    photos = get_sheet_photos(album)
+    sources = [image for _, image in photos]
+    if album.contact_sheet_layout.get("sources", []) == sources:
+        mark_rendered(album)
+        return
+
+    thumbnails = []
+    for photo_id, image in photos:
+        try:
+            thumbnails.append((photo_id, make_thumbnail(image)))
+        except OSError:
+            logger.warning(f"Could not read {image} for album {album_id}")
+
+    name, layout = "", {"sources": sources}
+    if thumbnails:
+        name, layout = save_sheet(album_id, thumbnails, sources)
+
+    old_name = album.contact_sheet.name
+    Album.all_objects.filter(id=album_id).update(
+        contact_sheet=name, contact_sheet_layout=layout
+    )
+    mark_rendered(album)
+    # The homepage embeds the sheet, so cached copies are stale
+    bump_users(album_audience([album_id]))
+    if old_name and old_name != name:
+        album.contact_sheet.storage.delete(old_name)
+
+
+def mark_rendered(album):
+    # Unless it was requested again meanwhile, which queued another render
+    Album.all_objects.filter(
+        id=album.id, contact_sheet_requested_at=album.contact_sheet_requested_at
+    ).update(contact_sheet_requested_at=None)
+
+
+def save_sheet(album_id, thumbnails, sources):
+    """
+    Returns:
+        tuple: The stored name of the sheet, and its layout.
+    """
+    # A single tile, or grids of up to 2x2 and 3x3
+    columns = math.ceil(math.sqrt(len(thumbnails)))
+    rows = math.ceil(len(thumbnails) / columns)
+    sheet = Image.new("RGB", (columns * TILE_SIZE, rows * TILE_SIZE), "white")
+
+    tiles = []
+    for index, (photo_id, thumbnail) in enumerate(thumbnails):
+        x, y = index % columns * TILE_SIZE, index // columns * TILE_SIZE
+        sheet.paste(thumbnail, (x, y))
+        tiles.append(
+            {"photo": photo_id, "x": x, "y": y, "width": TILE_SIZE, "height": TILE_SIZE}
+        )
+
+    buffer = BytesIO()
+    sheet.save(buffer, "JPEG", quality=80, optimize=True)
+    content = ContentFile(buffer.getvalue())
+    storage = Album._meta.get_field("contact_sheet").storage
+    name = storage.save(
+        content_addressed_path("contact_sheets", content, f"album-{album_id}.jpg"),
+        content,
+    )
+    layout = {
+        "width": sheet.width,
+        "height": sheet.height,
+        "tiles": tiles,
+        "sources": sources,
+    }
+    return name, layout
@@ -0,0 +1,267 @@
+"""
+Background deletion of accounts, albums and photo sets.
+
+Deleting a large account in one request makes Django's collector load every
+related row and hold locks for the whole cascade. Instead, the targets are hidden
+right away and a DeletionJob removes them in batches of DELETION_BATCH_SIZE rows,
+each batch in its own short transaction, deleting the media files after the batch
+commits.
+
+Jobs run on a thread of the process that created them. Before running, a job is
+claimed by moving it to RUNNING with a conditional update, so it never runs twice
+at once. A running job touches `updated_at` after every batch; one left PENDING or
+RUNNING without progress for DELETION_STALE_SECONDS, e.g. because its worker was
+recycled, is claimed again by photos.recovery.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app.auth_cache import token_cache
+from . import contact_sheets
+from .models import Photo, Album, Collaboration, DeletionJob
+from .versions import (
+    album_audience,
+    album_contents,
+    muted,
+    photo_audience,
+    record_changes,
+    user_audience,
+)
+
+logger = logging.getLogger("django")
+
+# One worker per process keeps deletions from competing with each other for locks
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deletion")
+# Signs the tokens of get_status_token()
+STATUS_TOKEN_SALT = "photos.deletion.status"
+
+
+def schedule_deletion(requested_by, target_type, target_ids):
+    """
+    Hides the targets and queues a DeletionJob that removes them in the background.
+
+    Returns:
+        DeletionJob: The created job, to be reported to the client.
+    """
+    with transaction.atomic():
+        if target_type == "USER":
+            User.objects.filter(id__in=target_ids).update(is_active=False)
+            # update() sends no signals, so cached tokens are dropped here
+            for user_id in target_ids:
+                token_cache.invalidate_user(user_id)
+            photos = Photo.all_objects.filter(user_id__in=target_ids)
+            # Too much may change to be logged object by object, so the clients
+            # of everyone who could see the account's content resync
+            audience = user_audience(target_ids) - set(target_ids)
+            # Albums of others showing the user's photos
+            contact_sheets.schedule(contact_sheets.albums_showing(photos.values("id")))
+            photos.update(is_hidden=True)
+            Album.all_objects.filter(user_id__in=target_ids).update(is_hidden=True)
+            record_changes(audience, reset=True)
+            total_photos = photos.count()
+        elif target_type == "ALBUM":
+            contents = album_contents(target_ids)
+            Album.all_objects.filter(id__in=target_ids).update(is_hidden=True)
+            record_changes(
+                album_audience(target_ids),
+                album_ids=target_ids,
+                photo_ids=set().union(*contents.values()),
+            )
+            total_photos = 0
+        else:
+            Photo.all_objects.filter(id__in=target_ids).update(is_hidden=True)
+            record_changes(photo_audience(target_ids), photo_ids=target_ids)
+            contact_sheets.schedule_for_photos(target_ids)
+            total_photos = len(target_ids)
+
+        job = DeletionJob.objects.create(
+            requested_by=requested_by,
+            target_type=target_type,
+            target_ids=list(target_ids),
+            total_photos=total_photos,
+        )
+        transaction.on_commit(lambda: executor.submit(run_job, job.id))
+
+    return job
+
+
+def get_status_token(job):
+    """
+    Returns:
+        str: A token reading the job's progress without logging in, which the
+        user of a deleted account can no longer do.
+    """
+    return signing.dumps(job.id, salt=STATUS_TOKEN_SALT)
+
+
+def get_job_by_status_token(token):
+    """
+    Returns:
+        DeletionJob: The job of a get_status_token() token, or None when the
+        token is invalid or the job no longer exists.
+    """
+    try:
+        job_id = signing.loads(token, salt=STATUS_TOKEN_SALT)
+    except signing.BadSignature:
+        return None
+    return DeletionJob.objects.filter(id=job_id).first()
+
+
+def claimable(retry_failed=False):
+    """
+    Jobs that no process is running: pending ones, and running ones that made no
+    progress for DELETION_STALE_SECONDS.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.DELETION_STALE_SECONDS)
+    query = Q(status="PENDING") | Q(status="RUNNING", updated_at__lt=stale)
+    if retry_failed:
+        query |= Q(status="FAILED")
+    return query
+
+
+def claim_job(job_id, retry_failed=False):
+    """
+    Returns:
+        bool: Whether this process now runs the job. Only one of the processes
+        claiming a job at once gets it.
+    """
+    claimed = DeletionJob.objects.filter(claimable(retry_failed), id=job_id).update(
+        status="RUNNING", updated_at=timezone.now()
+    )
+    return claimed == 1
+
+
+def resume_jobs():
+    """Queues the jobs whose process stopped before finishing them."""
+    stale = timezone.now() - timedelta(seconds=settings.DELETION_STALE_SECONDS)
+    job_ids = DeletionJob.objects.filter(claimable(), updated_at__lt=stale)
+    for job_id in job_ids.order_by("created_at").values_list("id", flat=True):
+        executor.submit(run_job, job_id)
+
+
+def run_job(job_id):
+    """Runs a job on the background thread and releases its DB connection."""
+    close_old_connections()
+    try:
+        if claim_job(job_id):
+            process_job(DeletionJob.objects.get(id=job_id))
+    except Exception:
+        logger.exception(f"Deletion job {job_id} crashed")
+    finally:
+        close_old_connections()
+
+
+def process_job(job):
+    """
+    Deletes everything a claimed job targets. Safe to run again on a job that was
+    interrupted: every step only looks at rows that still exist.
+    """
+    try:
+        # Changes were recorded when the targets were hidden, not for every row
+        with muted():
+            if job.target_type == "USER":
+                for user_id in job.target_ids:
+                    delete_user(job, user_id)
+            elif job.target_type == "ALBUM":
+                for album_id in job.target_ids:
+                    delete_album(job, album_id)
+            else:
+                delete_photos(job, Photo.all_objects.filter(id__in=job.target_ids))
+    except Exception as e:
+        logger.exception(f"Deletion job {job.id} failed")
+        job.status = "FAILED"
+        job.error = str(e)
+        job.save(update_fields=["status", "error", "updated_at"])
+        return
+
+    job.status = "COMPLETED"
+    job.completed_at = timezone.now()
+    job.save(update_fields=["status", "completed_at", "updated_at"])
+    logger.info(f"Deletion job {job.id} completed")
+
+
+def delete_photos(job, queryset):
+    """Deletes the photos of a queryset batch by batch, then their files."""
+    batch_size = settings.DELETION_BATCH_SIZE
+
+    while True:
+        batch = list(queryset.values_list("id", "image")[:batch_size])
+        if not batch:
+            return
+
+        photo_ids = [photo_id for photo_id, _ in batch]
+        with transaction.atomic():
+            # The collector only sees this batch's collaborations, album links
+            # and cover references, so the statements and locks stay small
+            Photo.all_objects.filter(id__in=photo_ids).delete()
+
+        storage = Photo._meta.get_field("image").storage
+        for _, image in batch:
+            if image:
+                try:
+                    storage.delete(image)
+                except OSError:
+                    logger.warning(f"Could not delete media file {image}")
+
+        DeletionJob.objects.filter(id=job.id).update(
+            deleted_photos=F("deleted_photos") + len(batch),
+            updated_at=timezone.now(),
+        )
+
+
+def delete_album(job, album_id):
+    """Removes an album's shares and photo links in batches, then the album."""
+    batch_size = settings.DELETION_BATCH_SIZE
+    album_photos = Album.photos.through.objects.filter(album_id=album_id)
+
+    delete_in_batches(job, Collaboration.objects.filter(album_id=album_id), batch_size)
+    delete_in_batches(job, album_photos, batch_size)
+    contact_sheet = (
+        Album.all_objects.filter(id=album_id)
+        .values_list("contact_sheet", flat=True)
+        .first()
+    )
+    Album.all_objects.filter(id=album_id).delete()
+    if contact_sheet:
+        try:
+            Album._meta.get_field("contact_sheet").storage.delete(contact_sheet)
+        except OSError:
+            logger.warning(f"Could not delete media file {contact_sheet}")
+
+
+def delete_user(job, user_id):
+    """Removes a user's photos, albums and shares in batches, then the user."""
+    batch_size = settings.DELETION_BATCH_SIZE
+
+    delete_photos(job, Photo.all_objects.filter(user_id=user_id))
+    album_ids = list(
+        Album.all_objects.filter(user_id=user_id).values_list("id", flat=True)
+    )
+    for album_id in album_ids:
+        delete_album(job, album_id)
+    delete_in_batches(
+        job, Collaboration.objects.filter(shared_by_id=user_id), batch_size
+    )
+    delete_in_batches(
+        job, Collaboration.objects.filter(shared_with_id=user_id), batch_size
+    )
+    User.objects.filter(id=user_id).delete()
+
+
+def delete_in_batches(job, queryset, batch_size):
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return
+        with transaction.atomic():
+            queryset.model._base_manager.filter(pk__in=ids).delete()
+        # Progress, so the job isn't taken for abandoned
+        DeletionJob.objects.filter(id=job.id).update(updated_at=timezone.now())
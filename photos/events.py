@@ -0,0 +1,58 @@
+"""
+/api/events: Server-Sent Events telling a user their library changed.
+
+Each event is named after what changed ("photo", "album", "share" or "reset") and
+carries no data beyond its type: clients fetch the changes with /api/sync, or
+export the library again on "reset". A "ready" event is sent on every
+(re)connection, after which clients should sync once to catch up with what they
+missed while disconnected.
+
+An open stream waits on its subscription without a thread or a database
+connection, and sends a comment every EVENTS_HEARTBEAT_SECONDS so proxies don't
+close it.
+"""
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from app.broadcast import broadcaster
+from app.renderers import ORJSONRenderer
+from .async_views import AsyncAPIView
+
+# Milliseconds clients wait before reconnecting
+RETRY_MS = 5000
+
+
+def format_event(event):
+    data = ORJSONRenderer().render({"type": event}).decode()
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+async def event_stream(user_id):
+    # Subscribed once the stream is read, so it is always unsubscribed
+    subscription = broadcaster.subscribe(user_id)
+    try:
+        yield f"retry: {RETRY_MS}\n\n".encode() + format_event("ready")
+        while True:
+            events = await subscription.next_events(settings.EVENTS_HEARTBEAT_SECONDS)
+            if not events:
+                yield b": ping\n\n"
+            for event in events:
+                yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+class EventStreamView(AsyncAPIView):
+    async def get(self, request):
+        # WSGI would read the endless stream into memory before sending it
+        if not isinstance(request, ASGIRequest):
+            return self.render(
+                {"detail": "Event streams are only served under ASGI."}, status=501
+            )
+
+        return StreamingHttpResponse(
+            event_stream(request.user.id),
+            content_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
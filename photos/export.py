@@ -0,0 +1,197 @@
+"""
+Streaming export of everything a user can see, as newline-delimited JSON.
+
+Each line is a JSON object with a `type` and the `data` of one record:
+- "photo": the user's photos, photos shared with them and photos of albums shared
+  with them, as rendered by PhotoSerializer.
+- "album": the user's albums and albums shared with them, with `cover_photo` as an
+  ID and the IDs of their `photos`.
+- "collaboration": shares made by or with the user, with related objects as IDs.
+A new export starts with a line of type "start" and the `cursor` to pass to
+/api/sync afterwards, see photos.sync. The last line has the type "end", so a
+truncated export can be told apart from a complete one.
+
+Records are streamed in that order, each type by ID, straight from server-side
+cursors in chunks of EXPORT_CHUNK_SIZE rows, so memory use doesn't grow with the
+library. An interrupted export is resumed with `?after=<type>:<id>`, the type and
+ID of the last line received.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from rest_framework.exceptions import ValidationError
+
+from app.renderers import ORJSONRenderer
+from .models import Photo, Album, Collaboration
+from .serializers import (
+    ALBUM_FIELDS,
+    COLLABORATION_FIELDS,
+    PHOTO_FIELDS,
+    Column,
+    ValuesListSerializer,
+)
+
+SECTIONS = ["photo", "album", "collaboration"]
+
+
+class PhotoExportSerializer(ValuesListSerializer):
+    sparse = False
+    fields = PHOTO_FIELDS
+
+
+class AlbumExportSerializer(ValuesListSerializer):
+    sparse = False
+    # The IDs of the photos are exported instead of their count
+    fields = {
+        **ALBUM_FIELDS,
+        "cover_photo": Column("cover_photo"),
+    }
+    del fields["photo_count"]
+
+
+class CollaborationExportSerializer(ValuesListSerializer):
+    sparse = False
+    fields = {
+        **COLLABORATION_FIELDS,
+        "shared_by": Column("shared_by"),
+        "shared_with": Column("shared_with"),
+        "photo": Column("photo"),
+        "album": Column("album"),
+    }
+
+
+def parse_after(after):
+    """
+    Returns:
+        tuple: The section and ID an export resumes after, or None to start over.
+    """
+    if not after:
+        return None
+
+    section, _, record_id = after.partition(":")
+    if section not in SECTIONS or not record_id.isdigit():
+        raise ValidationError({"after": "Expected <type>:<id>, e.g. album:42."})
+    return section, int(record_id)
+
+
+def get_shared_albums(user):
+    return Album.objects.filter(
+        collaborations__shared_with=user, collaborations__content_type="ALBUM"
+    ).values("id")
+
+
+def get_photos(user):
+    shared_albums = get_shared_albums(user)
+    return Photo.objects.filter(
+        Q(user=user)
+        | Exists(
+            Collaboration.objects.filter(
+                photo=OuterRef("pk"), content_type="PHOTO", shared_with=user
+            )
+        )
+        | Exists(
+            Album.photos.through.objects.filter(
+                photo_id=OuterRef("pk"), album_id__in=shared_albums
+            )
+        )
+        | Exists(Album.objects.filter(cover_photo=OuterRef("pk"), id__in=shared_albums))
+    )
+
+
+def get_albums(user):
+    return Album.objects.filter(Q(user=user) | Q(id__in=get_shared_albums(user)))
+
+
+def get_collaborations(user):
+    return Collaboration.objects.filter(Q(shared_by=user) | Q(shared_with=user))
+
+
+def iterate(queryset):
+    # A server-side cursor where the database supports it, see QuerySet.iterator()
+    return queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def with_photo_ids(albums, memberships):
+    """
+    Adds the IDs of their photos to the albums, merging two streams ordered by
+    album ID.
+    """
+    memberships = iter(memberships)
+    membership = next(memberships, None)
+    for album in albums:
+        photo_ids = []
+        while membership is not None and membership[0] <= album["id"]:
+            if membership[0] == album["id"]:
+                photo_ids.append(membership[1])
+            membership = next(memberships, None)
+        album["photos"] = photo_ids
+        yield album
+
+
+def export_records(user, context, after=None):
+    """
+    Yields:
+        tuple: The type and data of each record visible to the user, in export
+        order, starting after `after` as returned by parse_after().
+    """
+    start, after_id = after or (SECTIONS[0], 0)
+
+    def resume(section, queryset):
+        if SECTIONS.index(section) < SECTIONS.index(start):
+            return None
+        if section == start:
+            queryset = queryset.filter(id__gt=after_id)
+        return queryset.order_by("id")
+
+    photos = resume("photo", get_photos(user))
+    if photos is not None:
+        serializer = PhotoExportSerializer(context)
+        for row in iterate(serializer.get_rows(photos)):
+            yield "photo", serializer.to_representation(row)
+
+    albums = resume("album", get_albums(user))
+    if albums is not None:
+        serializer = AlbumExportSerializer(context)
+        memberships = (
+            Album.photos.through.objects.filter(
+                album_id__in=albums.values("id"), photo__is_hidden=False
+            )
+            .order_by("album_id", "photo_id")
+            .values_list("album_id", "photo_id")
+        )
+        rows = iterate(serializer.get_rows(albums))
+        albums_data = (serializer.to_representation(row) for row in rows)
+        for album in with_photo_ids(albums_data, iterate(memberships)):
+            yield "album", album
+
+    collaborations = resume("collaboration", get_collaborations(user))
+    if collaborations is not None:
+        serializer = CollaborationExportSerializer(context)
+        for row in iterate(serializer.get_rows(collaborations)):
+            yield "collaboration", serializer.to_representation(row)
+
+
+def export_lines(user, context, after=None, cursor=None):
+    renderer = ORJSONRenderer()
+    if cursor is not None:
+        yield renderer.render({"type": "start", "cursor": cursor}) + b"\n"
+    for record_type, data in export_records(user, context, after):
+        yield renderer.render({"type": record_type, "data": data}) + b"\n"
+    yield renderer.render({"type": "end"}) + b"\n"
+
+
+async def aexport_lines(user, context, after=None, cursor=None):
+    """
+    export_lines() for ASGI, which would otherwise read a synchronous iterator to
+    the end before sending anything. Chunks are read in the request's thread, so
+    the cursors stay on the same database connection.
+    """
+    lines = export_lines(user, context, after, cursor)
+    read_chunk = sync_to_async(
+        lambda: b"".join(islice(lines, settings.EXPORT_CHUNK_SIZE)),
+        thread_sensitive=True,
+    )
+    while chunk := await read_chunk():
+        yield chunk
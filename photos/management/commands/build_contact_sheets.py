@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from photos.contact_sheets import pending_albums, render_contact_sheet
+from photos.models import Album
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the contact sheets of albums that changed while no sheet was "
+        "rendered, e.g. albums created before contact sheets existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pending",
+            action="store_true",
+            help="Only render the sheets requested and not rendered since.",
+        )
+
+    def handle(self, *args, **options):
+        albums = pending_albums() if options["pending"] else Album.objects.all()
+        album_ids = albums.order_by("id").values_list("id", flat=True)
+        # Counted first, rendering takes albums off the pending ones
+        count = album_ids.count()
+
+        for album_id in album_ids.iterator():
+            render_contact_sheet(album_id)
+        self.stdout.write(f"Checked {count} albums")
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.schema import generate_schema, render_schema_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the OpenAPI schema served at /api/schema to OPENAPI_SCHEMA_FILE. "
+        "With --check, fails instead if the file doesn't match the code."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Exit with an error if the prebuilt schema is out of date.",
+        )
+
+    def handle(self, *args, **options):
+        path = settings.OPENAPI_SCHEMA_FILE
+        content = render_schema_file(generate_schema())
+
+        if options["check"]:
+            try:
+                with open(path, "rb") as file:
+                    current = file.read()
+            except FileNotFoundError:
+                current = None
+            if current != content:
+                raise CommandError(
+                    f"{path} is out of date, run `manage.py build_schema`."
+                )
+            self.stdout.write(f"{path} is up to date")
+            return
+
+        with open(path, "wb") as file:
+            file.write(content)
+        self.stdout.write(f"Wrote {path}")
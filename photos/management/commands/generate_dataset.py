@@ -0,0 +1,357 @@
+import io
+import math
+import os
+import random
+import time
+from datetime import timedelta
+
+import orjson
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from photos.models import Photo, Album, Collaboration, content_addressed_path
+
+# Shape of the power law: a few users own most photos and share the most, and
+# a few receive the most shares
+ALPHA = 1.5
+# Distinct placeholder images, so photos spread over as many hash directories
+PLACEHOLDERS = 256
+CAMERAS = ["Pixel 8", "iPhone 15", "EOS R6", "X-T5", "Galaxy S24"]
+CITIES = ["Kathmandu", "Berlin", "Lisbon", "Osaka", "Lima", "Nairobi"]
+
+
+def insert_rows(model, columns, rows):
+    """
+    Inserts tuples of column values with COPY on PostgreSQL, and executemany()
+    elsewhere. Unlike bulk_create this keeps the given created_at and
+    updated_at, and builds no model instances.
+    """
+    if not rows:
+        return
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ", ".join(connection.ops.quote_name(column) for column in columns)
+    # One commit per batch, not per row
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # Text format: tab separated, \N for NULL; no value contains a tab
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write(
+                    "\t".join("\\N" if value is None else str(value) for value in row)
+                )
+                buffer.write("\n")
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table} ({names}) FROM STDIN", buffer)
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(
+                f"INSERT INTO {table} ({names}) VALUES ({placeholders})", rows
+            )
+
+
+def make_placeholders(count):
+    """
+    Returns:
+        list: The content of `count` tiny JPEGs of different colours.
+    """
+    placeholders = []
+    for index in range(count):
+        colour = (index * 53 % 256, index * 97 % 256, index * 151 % 256)
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8), colour).save(buffer, "JPEG", quality=50)
+        placeholders.append(buffer.getvalue())
+    return placeholders
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a synthetic dataset for load tests: users owning a power-law "
+        "distribution of photos with small placeholder files, albums, and a "
+        "power-law share graph. Rows are inserted in batches with COPY on "
+        "PostgreSQL; run it against a database that serves no traffic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--photos", type=int, default=100_000)
+        parser.add_argument(
+            "--album-size", type=int, default=20, help="Photos per album"
+        )
+        parser.add_argument("--shares", type=int, default=50_000)
+        parser.add_argument("--days", type=int, default=365, help="Spread of dates")
+        parser.add_argument("--prefix", default="synthetic", help="Username prefix")
+        parser.add_argument("--password", default="synthetic")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument(
+            "--no-files",
+            action="store_true",
+            help="Only insert rows, media URLs of the photos then return 404",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 2:
+            raise CommandError("At least 2 users are needed to share photos.")
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+        self.days = options["days"]
+        started = time.perf_counter()
+
+        user_ids = self.create_users(
+            options["users"], options["prefix"], options["password"]
+        )
+        weights = [self.rng.paretovariate(ALPHA) for _ in user_ids]
+        photo_ranges = self.create_photos(
+            user_ids, weights, options["photos"], not options["no_files"]
+        )
+        album_ranges = self.create_albums(photo_ranges, options["album_size"])
+        shares = self.create_shares(
+            user_ids, weights, photo_ranges, album_ranges, options["shares"]
+        )
+
+        if connection.vendor == "postgresql":
+            # Rows were inserted with their ids, move the sequences past them
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Photo, Album]
+                ):
+                    cursor.execute(sql)
+
+        self.stdout.write(
+            f"Created {len(user_ids)} users, "
+            f"{sum(count for _, _, count in photo_ranges)} photos, "
+            f"{sum(count for _, _, count in album_ranges)} albums and {shares} shares "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    def random_date(self):
+        return self.now - timedelta(seconds=self.rng.random() * self.days * 86400)
+
+    def adapt_date(self, value):
+        return connection.ops.adapt_datetimefield_value(value)
+
+    def create_users(self, count, prefix, password):
+        offset = User.objects.filter(username__startswith=f"{prefix}-").count()
+        # Hashing is slow on purpose, every user gets the same hash
+        password = make_password(password)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    username=f"{prefix}-{offset + index}@example.com",
+                    email=f"{prefix}-{offset + index}@example.com",
+                    password=password,
+                )
+                for index in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        if users[0].pk is None:
+            # The database returns no ids from bulk inserts
+            users = User.objects.filter(
+                username__in=[user.username for user in users]
+            ).order_by("id")
+        return [user.pk for user in users]
+
+    def create_photos(self, user_ids, weights, total, write_files):
+        """
+        Returns:
+            list: The user ID, first photo ID and number of photos of each user,
+            whose photos have consecutive IDs.
+        """
+        placeholders = make_placeholders(PLACEHOLDERS)
+        # Placeholder paths without the file name, which holds the photo ID
+        directories = [
+            content_addressed_path("photos", ContentFile(content), "")
+            for content in placeholders
+        ]
+        if write_files:
+            for directory in directories:
+                os.makedirs(os.path.join(settings.MEDIA_ROOT, directory), exist_ok=True)
+
+        total_weight = sum(weights)
+        next_id = (Photo.all_objects.aggregate(Max("id"))["id__max"] or 0) + 1
+        photo_ranges = []
+        columns = [
+            "id",
+            "user_id",
+            "image",
+            "created_at",
+            "updated_at",
+            "format",
+            "is_bookmarked",
+            "metadata",
+            "is_hidden",
+        ]
+        rows = []
+        for user_id, weight in zip(user_ids, weights):
+            count = round(total * weight / total_weight)
+            photo_ranges.append((user_id, next_id, count))
+            for photo_id in range(next_id, next_id + count):
+                placeholder = photo_id % PLACEHOLDERS
+                name = f"{directories[placeholder]}synthetic-{photo_id}.jpg"
+                if write_files:
+                    path = os.path.join(settings.MEDIA_ROOT, name)
+                    with open(path, "wb") as file:
+                        file.write(placeholders[placeholder])
+
+                created_at = self.adapt_date(self.random_date())
+                metadata = {
+                    "camera": self.rng.choice(CAMERAS),
+                    "city": self.rng.choice(CITIES),
+                }
+                rows.append(
+                    (
+                        photo_id,
+                        user_id,
+                        name,
+                        created_at,
+                        created_at,
+                        "jpg",
+                        self.rng.random() < 0.05,
+                        orjson.dumps(metadata).decode(),
+                        False,
+                    )
+                )
+                if len(rows) >= self.batch_size:
+                    insert_rows(Photo, columns, rows)
+                    rows = []
+            next_id += count
+        insert_rows(Photo, columns, rows)
+        return photo_ranges
+
+    def create_albums(self, photo_ranges, album_size):
+        """
+        Returns:
+            list: The user ID, first album ID and number of albums of each user.
+        """
+        next_id = (Album.all_objects.aggregate(Max("id"))["id__max"] or 0) + 1
+        album_ranges = []
+        columns = [
+            "id",
+            "user_id",
+            "name",
+            "description",
+            "cover_photo_id",
+            "created_at",
+            "updated_at",
+            "is_hidden",
+            "contact_sheet",
+            "contact_sheet_layout",
+        ]
+        albums, memberships = [], []
+        for user_id, first_photo_id, photo_count in photo_ranges:
+            count = math.ceil(photo_count / album_size)
+            album_ranges.append((user_id, next_id, count))
+            for index, album_id in enumerate(range(next_id, next_id + count)):
+                photo_ids = self.rng.sample(
+                    range(first_photo_id, first_photo_id + photo_count),
+                    min(album_size, photo_count),
+                )
+                created_at = self.adapt_date(self.random_date())
+                albums.append(
+                    (
+                        album_id,
+                        user_id,
+                        f"{self.rng.choice(CITIES)} {index + 1}",
+                        "",
+                        photo_ids[0],
+                        created_at,
+                        created_at,
+                        False,
+                        "",
+                        "{}",
+                    )
+                )
+                memberships += [(album_id, photo_id) for photo_id in photo_ids]
+                if len(memberships) >= self.batch_size:
+                    # Albums first, the memberships reference them
+                    insert_rows(Album, columns, albums)
+                    insert_rows(
+                        Album.photos.through, ["album_id", "photo_id"], memberships
+                    )
+                    albums, memberships = [], []
+            next_id += count
+        insert_rows(Album, columns, albums)
+        insert_rows(Album.photos.through, ["album_id", "photo_id"], memberships)
+        return album_ranges
+
+    def create_shares(self, user_ids, weights, photo_ranges, album_ranges, total):
+        """
+        Shares photos (3 in 4) and albums between users picked by weight, so
+        both the number of shares sent and received follow the power law.
+
+        Returns:
+            int: The number of shares created.
+        """
+        photos_by_user = {
+            user_id: (first, count) for user_id, first, count in photo_ranges
+        }
+        albums_by_user = {
+            user_id: (first, count) for user_id, first, count in album_ranges
+        }
+        cumulative = []
+        running = 0
+        for weight in weights:
+            running += weight
+            cumulative.append(running)
+
+        columns = [
+            "shared_by_id",
+            "shared_with_id",
+            "message",
+            "content_type",
+            "photo_id",
+            "album_id",
+            "permission",
+            "created_at",
+        ]
+        # Shared with and item of each share, which must be unique
+        seen = set()
+        rows = []
+        attempts = 0
+        while len(seen) < total and attempts < total * 3:
+            attempts += 1
+            shared_by, shared_with = self.rng.choices(
+                user_ids, cum_weights=cumulative, k=2
+            )
+            content_type = "PHOTO" if self.rng.random() < 0.75 else "ALBUM"
+            first, count = (
+                photos_by_user if content_type == "PHOTO" else albums_by_user
+            )[shared_by]
+            if shared_by == shared_with or not count:
+                continue
+
+            item_id = first + self.rng.randrange(count)
+            key = (shared_with, content_type, item_id)
+            if key in seen:
+                continue
+
+            seen.add(key)
+            rows.append(
+                (
+                    shared_by,
+                    shared_with,
+                    "",
+                    content_type,
+                    item_id if content_type == "PHOTO" else None,
+                    item_id if content_type == "ALBUM" else None,
+                    "EDIT" if self.rng.random() < 0.1 else "VIEW",
+                    self.adapt_date(self.random_date()),
+                )
+            )
+            if len(rows) >= self.batch_size:
+                insert_rows(Collaboration, columns, rows)
+                rows = []
+        insert_rows(Collaboration, columns, rows)
+        return len(seen)
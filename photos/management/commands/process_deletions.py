@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from photos.deletion import claim_job, claimable, process_job
+from photos.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs deletion jobs that failed, are still pending or were interrupted, "
+        "e.g. by a restart while the background thread was working. Jobs a "
+        "worker is running are skipped."
+    )
+
+    def handle(self, *args, **options):
+        jobs = DeletionJob.objects.filter(claimable(retry_failed=True))
+
+        for job in jobs.order_by("created_at"):
+            if not claim_job(job.id, retry_failed=True):
+                # Claimed by a worker in the meantime
+                continue
+            self.stdout.write(f"Processing {job}")
+            process_job(job)
+            self.stdout.write(f"Finished with status {job.status}")
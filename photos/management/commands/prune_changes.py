@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from photos.models import Change
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes sync changes older than SYNC_RETENTION_DAYS. Clients with an "
+        "older cursor are told to export their library again."
+    )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.SYNC_RETENTION_DAYS)
+        deleted, _ = Change.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(f"Deleted {deleted} changes")
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("photos", "0004_library_versions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Change",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id", models.BigIntegerField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("PHOTO", "Photo"),
+                            ("ALBUM", "Album"),
+                            ("COLLABORATION", "Collaboration"),
+                            ("RESET", "Reset"),
+                        ],
+                        max_length=13,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField(null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user_id", "id"], name="photos_chan_user_id_96919a_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:25
+
+import photos.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("photos", "0005_changes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="photo",
+            name="image",
+            field=models.ImageField(upload_to=photos.models.photo_upload_to),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("photos", "0006_content_addressed_images"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="album",
+            name="contact_sheet",
+            field=models.ImageField(blank=True, upload_to="contact_sheets/"),
+        ),
+        migrations.AddField(
+            model_name="album",
+            name="contact_sheet_layout",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+def number_changes(apps, schema_editor):
+    """Numbers the logged changes of each user in ID order, after their version."""
+    Change = apps.get_model("photos", "Change")
+    LibraryVersion = apps.get_model("photos", "LibraryVersion")
+    User = apps.get_model("auth", "User")
+
+    user_ids = set(Change.objects.values_list("user_id", flat=True).distinct())
+    existing = set(User.objects.filter(id__in=user_ids).values_list("id", flat=True))
+    # Nothing can sync the changes of deleted accounts
+    Change.objects.exclude(user_id__in=existing).delete()
+
+    for user_id in existing:
+        library_version, _ = LibraryVersion.objects.get_or_create(user_id=user_id)
+        changes = list(Change.objects.filter(user_id=user_id).order_by("id"))
+        for change in changes:
+            library_version.version += 1
+            change.seq = library_version.version
+        Change.objects.bulk_update(changes, ["seq"], batch_size=1000)
+        library_version.save(update_fields=["version"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("photos", "0007_album_contact_sheets"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="change",
+            name="seq",
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(number_changes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="change",
+            name="seq",
+            field=models.BigIntegerField(),
+        ),
+        migrations.RemoveIndex(
+            model_name="change",
+            name="photos_chan_user_id_96919a_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="change",
+            constraint=models.UniqueConstraint(
+                fields=("user_id", "seq"), name="unique_change_seq"
+            ),
+        ),
+    ]
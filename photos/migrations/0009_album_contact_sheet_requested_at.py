@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("photos", "0008_change_seq"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="album",
+            name="contact_sheet_requested_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,17 +1,50 @@
 from django.db import models
+from django.db.models import Case, Count, Exists, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+import hashlib
 import os
+from datetime import datetime
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 
 
+class VisibleManager(models.Manager):
+    """Default manager that hides rows waiting for background deletion."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_hidden=False)
+
+
+def content_addressed_path(directory, file, filename):
+    """
+    A path in a directory named after a hash of the file's content, so its URL
+    always serves the same bytes and can be cached forever: a replaced file gets
+    a new URL. See app.views.serve_media.
+    """
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    date = datetime.now().strftime("%Y/%m/%d")
+    return f"{directory}/{date}/{digest.hexdigest()[:16]}/{filename}"
+
+
+def photo_upload_to(instance, filename):
+    return content_addressed_path("photos", instance.image, filename)
+
+
 class Photo(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="photos")
-    image = models.ImageField(upload_to="photos/%Y/%m/%d/")
+    image = models.ImageField(upload_to=photo_upload_to)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     format = models.CharField(max_length=10, blank=True)
     is_bookmarked = models.BooleanField(default=False)
     metadata = models.JSONField(default=dict, blank=True)
+    # Set while a DeletionJob removes the photo in the background
+    is_hidden = models.BooleanField(default=False)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ["-created_at"]
@@ -27,6 +60,27 @@ class Photo(models.Model):
         super().save(*args, **kwargs)
 
 
+class AlbumQuerySet(models.QuerySet):
+    def with_photo_count(self):
+        """
+        Annotates `total_photos`: the number of photos in the album plus the
+        cover photo when it is not one of them, computed in the same query.
+        """
+        album_photos = Album.photos.through.objects.filter(album_id=OuterRef("pk"))
+        photos_in_album = (
+            album_photos.values("album_id").annotate(total=Count("*")).values("total")
+        )
+        cover_in_album = album_photos.filter(photo_id=OuterRef("cover_photo_id"))
+
+        return self.annotate(
+            total_photos=Coalesce(Subquery(photos_in_album), Value(0))
+            + Case(
+                When(~Exists(cover_in_album), cover_photo__isnull=False, then=Value(1)),
+                default=Value(0),
+            )
+        )
+
+
 class Album(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="albums")
     name = models.CharField(max_length=255)
@@ -41,6 +95,17 @@ class Album(models.Model):
     photos = models.ManyToManyField(Photo, related_name="albums", blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set while a DeletionJob removes the album in the background
+    is_hidden = models.BooleanField(default=False)
+    # Thumbnails of the album's first photos in one image, and where each one is,
+    # rendered by photos.contact_sheets
+    contact_sheet = models.ImageField(upload_to="contact_sheets/", blank=True)
+    contact_sheet_layout = models.JSONField(default=dict, blank=True)
+    # Set when the sheet has to be rendered again, cleared once it is
+    contact_sheet_requested_at = models.DateTimeField(null=True, blank=True)
+
+    objects = VisibleManager.from_queryset(AlbumQuerySet)()
+    all_objects = AlbumQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
@@ -131,10 +196,11 @@ class Collaboration(models.Model):
 
     def __str__(self):
         if self.content_type == "PHOTO":
-            item_id = self.photo.id if self.photo else "None"
+            # The IDs, so listing shares doesn't load every photo and album
+            item_id = self.photo_id or "None"
             item_type = "Photo"
         else:
-            item_id = self.album.id if self.album else "None"
+            item_id = self.album_id or "None"
             item_type = "Album"
 
         return f"{item_type} {item_id} shared by {self.shared_by.username} with {self.shared_with.username}"
@@ -146,3 +212,106 @@ class Collaboration(models.Model):
             return self.photo
         else:
             return self.album
+
+
+class DeletionJob(models.Model):
+    """
+    Tracks the background removal of an account, an album or a set of photos.
+
+    The targets are hidden as soon as the job is created; the rows and media
+    files are then deleted in small batches by photos.deletion.
+    """
+
+    TARGET_TYPE_CHOICES = [
+        ("USER", "User"),
+        ("ALBUM", "Album"),
+        ("PHOTOS", "Photos"),
+    ]
+
+    STATUS_CHOICES = [
+        ("PENDING", "Pending"),
+        ("RUNNING", "Running"),
+        ("COMPLETED", "Completed"),
+        ("FAILED", "Failed"),
+    ]
+
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="deletion_jobs",
+    )
+    target_type = models.CharField(max_length=6, choices=TARGET_TYPE_CHOICES)
+    target_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=9, choices=STATUS_CHOICES, default="PENDING")
+    total_photos = models.PositiveIntegerField(default=0)
+    deleted_photos = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Deletion of {self.target_type} {self.target_ids} ({self.status})"
+
+
+class LibraryVersion(models.Model):
+    """
+    Counter bumped whenever something a user can see changes: their photos and
+    albums, album contents, and what is shared with them.
+
+    It validates conditional GETs of the user's collections, see photos.versions,
+    and numbers the user's Change rows.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="library_version",
+    )
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Library of {self.user_id} at version {self.version}"
+
+
+class Change(models.Model):
+    """
+    An object that changed for a user: it was created, updated or deleted, or the
+    user gained or lost access to it. Read by the /api/sync endpoint, which
+    checks whether each object is still visible to the user.
+
+    A RESET tells the user's clients to export the library again, for changes too
+    large to log object by object. Rows are kept SYNC_RETENTION_DAYS days.
+
+    `seq` numbers the user's changes in the order their transactions commit, see
+    photos.versions.log_changes().
+    """
+
+    KIND_CHOICES = [
+        ("PHOTO", "Photo"),
+        ("ALBUM", "Album"),
+        ("COLLABORATION", "Collaboration"),
+        ("RESET", "Reset"),
+    ]
+
+    # Not a foreign key: rows logged for an account being deleted stay valid
+    user_id = models.BigIntegerField()
+    kind = models.CharField(max_length=13, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField(null=True)
+    seq = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_id", "seq"], name="unique_change_seq")
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} changed for {self.user_id}"
@@ -0,0 +1,36 @@
+"""
+Picks up background work that a worker left unfinished.
+
+Deletion jobs and contact sheet renders run on threads of the worker that queued
+them, and a worker that is recycled or killed loses what it queued. Every gunicorn
+worker resumes such work from a daemon thread when it starts and then every
+RECOVERY_INTERVAL seconds, see app/gunicorn_conf.py. Elsewhere, the management
+commands do it.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import contact_sheets, deletion
+
+logger = logging.getLogger("django")
+
+
+def start():
+    threading.Thread(target=run, name="recovery", daemon=True).start()
+
+
+def run():
+    while True:
+        try:
+            deletion.resume_jobs()
+            contact_sheets.resume_renders()
+        except Exception:
+            logger.exception("Could not resume background work")
+        finally:
+            # Don't keep a connection open per worker between rounds
+            connection.close()
+        time.sleep(settings.RECOVERY_INTERVAL)
@@ -1,18 +1,143 @@
+from operator import itemgetter
+from typing import Callable, NamedTuple
+
 from rest_framework import serializers
+from django.conf import settings
+from django.db.models import Exists, Func, JSONField, OuterRef, Q, Subquery, Value
+from django.utils import timezone
+from django.urls import reverse
+from django.utils.encoding import filepath_to_uri
 from django.contrib.auth.models import User
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 
-from .models import Photo, Album, Collaboration
+from .deletion import get_status_token
+from .models import Photo, Album, Collaboration, DeletionJob
+from .versions import (
+    log_changes,
+    photo_audience,
+    record_changes,
+    shared_item_changes,
+)
+
+
+def get_sparse_fields(request):
+    """
+    Reads `?fields=id,name` and `?expand=cover_photo` from the request.
+
+    Returns:
+        tuple: The requested fields (None for all of them) and the nested fields
+        to expand, or None when the request uses neither parameter.
+    """
+    params = getattr(request, "query_params", None) or getattr(request, "GET", {})
+    if "fields" not in params and "expand" not in params:
+        return None
+
+    expand = {name for name in params.get("expand", "").split(",") if name}
+    fields = None
+    if "fields" in params:
+        fields = {name for name in params["fields"].split(",") if name} | expand
+
+    return fields, expand
+
+
+# Sparse fieldsets for read responses: `?fields=` selects the fields returned
+# and `?expand=` the nested objects embedded in full. When either parameter is
+# used, nested objects that aren't expanded are collapsed to their IDs; without
+# them the output is unchanged.
+#
+# Only applies to the serializer a view creates, not to nested serializers, and
+# not when validating input. Serializers created by another one, e.g. in a
+# SerializerMethodField, must have `"nested": True` in their context.
+class SparseFieldsMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        context = kwargs.get("context", {})
+        request = context.get("request")
+        self.sparse = None
+        if request is not None and "data" not in kwargs and not context.get("nested"):
+            self.sparse = get_sparse_fields(request)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.sparse is None:
+            return fields
+
+        requested, expand = self.sparse
+        if requested is not None:
+            fields = {
+                name: field
+                for name, field in fields.items()
+                if name in requested or field.write_only
+            }
+
+        for name, field in fields.items():
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if name in expand or not isinstance(nested, serializers.ModelSerializer):
+                continue
+
+            kwargs = {"source": field.source} if field.source else {}
+            fields[name] = serializers.PrimaryKeyRelatedField(
+                read_only=True, many=many, **kwargs
+            )
+
+        return fields
+
+    def trim_queryset(self, queryset):
+        """
+        Loads what the rendered fields read: expanded related objects with
+        select_related() or prefetch_related(), and with `?fields=` only the
+        selected columns.
+        """
+        select, prefetch = self.get_related_paths(self.fields.values(), "", False)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+
+        if self.sparse is not None and self.sparse[0] is not None:
+            model_fields = queryset.model._meta.concrete_fields
+            # Foreign keys are kept, method fields often read related objects
+            only = {field.name for field in model_fields if field.is_relation}
+            only.add(queryset.model._meta.pk.name)
+            names = {field.name for field in model_fields}
+            for field in self.fields.values():
+                if field.source in names:
+                    only.add(field.source)
+            queryset = queryset.only(*only)
+
+        return queryset
+
+    def get_related_paths(self, fields, path, prefetched):
+        select, prefetch = [], []
+        for field in fields:
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if field.write_only or not isinstance(nested, serializers.ModelSerializer):
+                continue
+
+            related_path = path + field.source.replace(".", "__")
+            # Relations below a prefetched one are prefetched as well
+            prefetched_below = prefetched or many
+            (prefetch if prefetched_below else select).append(related_path)
+
+            nested_select, nested_prefetch = self.get_related_paths(
+                nested.fields.values(), related_path + "__", prefetched_below
+            )
+            select += nested_select
+            prefetch += nested_prefetch
+
+        return select, prefetch
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "username", "email"]
 
 
-class PhotoSerializer(serializers.ModelSerializer):
+class PhotoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Photo
         fields = [
@@ -39,7 +164,7 @@ class PhotoDetailSerializer(PhotoSerializer):
         fields = PhotoSerializer.Meta.fields + ["user"]
 
 
-class AlbumSerializer(serializers.ModelSerializer):
+class AlbumSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     cover_photo = PhotoSerializer(read_only=True)
     cover_photo_id = serializers.PrimaryKeyRelatedField(
         queryset=Photo.objects.all(),
@@ -65,6 +190,10 @@ class AlbumSerializer(serializers.ModelSerializer):
         read_only_fields = ["created_at", "updated_at"]
 
     def get_photo_count(self, obj):
+        # Set by Album.objects.with_photo_count(), saves two queries per album
+        if hasattr(obj, "total_photos"):
+            return obj.total_photos
+
         photos_count = obj.photos.count()
 
         if obj.cover_photo and not obj.photos.filter(id=obj.cover_photo.id).exists():
@@ -85,7 +214,7 @@ class AlbumDetailSerializer(AlbumSerializer):
         fields = AlbumSerializer.Meta.fields + ["photos", "user"]
 
 
-class CollaborationSerializer(serializers.ModelSerializer):
+class CollaborationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     shared_by = UserSerializer(read_only=True)
     shared_with_email = serializers.EmailField(write_only=True)
     shared_with = UserSerializer(read_only=True)
@@ -125,7 +254,8 @@ class CollaborationSerializer(serializers.ModelSerializer):
 
     def validate_shared_with_email(self, value):
         try:
-            User.objects.get(email=value)
+            # Kept for create() so the user is only looked up once
+            self._shared_with = User.objects.get(email=value)
         except User.DoesNotExist:
             raise serializers.ValidationError("User with this email does not exist.")
         return value
@@ -150,7 +280,7 @@ class CollaborationSerializer(serializers.ModelSerializer):
         # Validate the user has access to the item
         if content_type == "PHOTO":
             photo = data.get("photo")
-            if photo and photo.user != self.context["request"].user:
+            if photo and photo.user_id != self.context["request"].user.id:
                 # Check if the user has edit permission through collaboration
                 has_permission = Collaboration.objects.filter(
                     content_type="PHOTO",
@@ -165,7 +295,7 @@ class CollaborationSerializer(serializers.ModelSerializer):
                     )
         elif content_type == "ALBUM":
             album = data.get("album")
-            if album and album.user != self.context["request"].user:
+            if album and album.user_id != self.context["request"].user.id:
                 # Check if the user has edit permission through collaboration
                 has_permission = Collaboration.objects.filter(
                     content_type="ALBUM",
@@ -182,9 +312,9 @@ class CollaborationSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        # Get the shared_with user from email
-        shared_with_email = validated_data.pop("shared_with_email")
-        shared_with = User.objects.get(email=shared_with_email)
+        # The shared_with user was resolved while validating the email
+        validated_data.pop("shared_with_email")
+        shared_with = self._shared_with
 
         # Set the shared_by user from the request
         validated_data["shared_by"] = self.context["request"].user
@@ -200,6 +330,303 @@ class CollaborationSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+def share_key(share):
+    """Identifies a share the way the unique constraints on Collaboration do."""
+    return (share.content_type, share.photo_id, share.album_id, share.shared_with_id)
+
+
+class BulkCollaborationSerializer(serializers.Serializer):
+    photo_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list, max_length=500
+    )
+    album_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list, max_length=100
+    )
+    shared_with_emails = serializers.ListField(
+        child=serializers.EmailField(), min_length=1, max_length=50
+    )
+    permission = serializers.ChoiceField(
+        choices=Collaboration.PERMISSION_CHOICES, default="VIEW"
+    )
+    message = serializers.CharField(required=False, allow_blank=True, default="")
+
+    def validate(self, data):
+        if not data["photo_ids"] and not data["album_ids"]:
+            raise serializers.ValidationError(
+                "At least one photo ID or album ID is required."
+            )
+        return data
+
+    def share(self):
+        """
+        Shares every requested item with every requested user.
+
+        Users are resolved with one query, permissions are checked with one query
+        per content type, existing shares are found with one more query and the
+        new rows are inserted with a single bulk_create.
+
+        Returns:
+            dict: The number of created shares and a result for every
+            (item, email) pair.
+        """
+        request_user = self.context["request"].user
+        data = self.validated_data
+        photo_ids = list(dict.fromkeys(data["photo_ids"]))
+        album_ids = list(dict.fromkeys(data["album_ids"]))
+        emails = list(dict.fromkeys(data["shared_with_emails"]))
+
+        users_by_email = {
+            user.email: user for user in User.objects.filter(email__in=emails)
+        }
+
+        shareable_photo_ids = self.get_shareable_ids(Photo, "PHOTO", photo_ids)
+        shareable_album_ids = self.get_shareable_ids(Album, "ALBUM", album_ids)
+
+        already_shared = set()
+        if users_by_email:
+            already_shared = set(
+                Collaboration.objects.filter(shared_with__in=users_by_email.values())
+                .filter(
+                    Q(content_type="PHOTO", photo_id__in=shareable_photo_ids)
+                    | Q(content_type="ALBUM", album_id__in=shareable_album_ids)
+                )
+                .values_list("content_type", "photo_id", "album_id", "shared_with_id")
+            )
+
+        items = [("PHOTO", photo_id, shareable_photo_ids) for photo_id in photo_ids]
+        items += [("ALBUM", album_id, shareable_album_ids) for album_id in album_ids]
+
+        results = []
+        new_shares = []
+        # Result of each new share, by the key of already_shared
+        pending = {}
+        for content_type, item_id, shareable_ids in items:
+            photo_id = item_id if content_type == "PHOTO" else None
+            album_id = item_id if content_type == "ALBUM" else None
+
+            for email in emails:
+                shared_with = users_by_email.get(email)
+                if shared_with is None:
+                    result = "user_not_found"
+                elif shared_with.id == request_user.id:
+                    result = "cannot_share_with_self"
+                elif item_id not in shareable_ids:
+                    result = "permission_denied"
+                elif (
+                    content_type,
+                    photo_id,
+                    album_id,
+                    shared_with.id,
+                ) in already_shared:
+                    result = "already_shared"
+                else:
+                    result = "shared"
+                    new_shares.append(
+                        Collaboration(
+                            shared_by=request_user,
+                            shared_with=shared_with,
+                            content_type=content_type,
+                            photo_id=photo_id,
+                            album_id=album_id,
+                            permission=data["permission"],
+                            message=data["message"],
+                        )
+                    )
+
+                results.append(
+                    {
+                        "content_type": content_type,
+                        "id": item_id,
+                        "shared_with_email": email,
+                        "result": result,
+                    }
+                )
+                if result == "shared":
+                    pending[share_key(new_shares[-1])] = results[-1]
+
+        # ignore_conflicts covers shares created concurrently since the lookup above
+        Collaboration.objects.bulk_create(new_shares, ignore_conflicts=True)
+        # bulk_create() sends no signals, and with ignore_conflicts sets no IDs
+        created = []
+        if new_shares:
+            candidates = Collaboration.objects.filter(
+                shared_by=request_user,
+                shared_with__in=[share.shared_with_id for share in new_shares],
+            ).filter(
+                Q(content_type="PHOTO", photo_id__in=shareable_photo_ids)
+                | Q(content_type="ALBUM", album_id__in=shareable_album_ids)
+            )
+            created = [share for share in candidates if share_key(share) in pending]
+            # Skipped as conflicts: shared by someone else since the lookup above
+            created_keys = {share_key(share) for share in created}
+            for key in pending.keys() - created_keys:
+                pending[key]["result"] = "already_shared"
+
+            record_changes(
+                [request_user.id],
+                collaboration_ids=[share.id for share in created],
+            )
+            log_changes(shared_item_changes(created))
+
+        return {"created": len(created), "results": results}
+
+    def get_shareable_ids(self, model, content_type, ids):
+        """Returns the IDs the user owns or was given edit permission on."""
+        if not ids:
+            return set()
+
+        request_user = self.context["request"].user
+        return set(
+            model.objects.filter(id__in=ids)
+            .filter(
+                Q(user=request_user)
+                | Q(
+                    collaborations__content_type=content_type,
+                    collaborations__shared_with=request_user,
+                    collaborations__permission="EDIT",
+                )
+            )
+            .values_list("id", flat=True)
+        )
+
+
+class JSONMerge(Func):
+    """
+    Merges the keys of a JSON object into a JSON column, as PostgreSQL's jsonb ||.
+    SQLite, used in development, also merges nested objects and drops null values.
+    """
+
+    arg_joiner = " || "
+    template = "(%(expressions)s)"
+    output_field = JSONField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler,
+            connection,
+            function="json_patch",
+            template="%(function)s(%(expressions)s)",
+            arg_joiner=", ",
+        )
+
+
+class BulkPhotoUpdateSerializer(serializers.Serializer):
+    CHUNK_SIZE = 500
+
+    photo_ids = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=5000
+    )
+    is_bookmarked = serializers.BooleanField(required=False)
+    # Keys to add or replace, the other keys of each photo's metadata are kept
+    metadata = serializers.DictField(required=False)
+
+    def validate(self, data):
+        if "is_bookmarked" not in data and "metadata" not in data:
+            raise serializers.ValidationError(
+                "At least one of is_bookmarked or metadata is required."
+            )
+        return data
+
+    def update_photos(self):
+        """
+        Applies the patch to the photos the user owns or may edit.
+
+        The photos are authorized with one query and updated with one UPDATE per
+        CHUNK_SIZE photos, without loading them.
+
+        Returns:
+            dict: The number of updated photos.
+        """
+        request_user = self.context["request"].user
+        data = self.validated_data
+
+        photo_ids = list(
+            Photo.objects.filter(id__in=set(data["photo_ids"]))
+            .filter(
+                Q(user=request_user)
+                | Exists(
+                    Collaboration.objects.filter(
+                        photo=OuterRef("pk"),
+                        content_type="PHOTO",
+                        shared_with=request_user,
+                        permission="EDIT",
+                    )
+                )
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        # update() doesn't set auto_now fields
+        changes = {"updated_at": timezone.now()}
+        if "is_bookmarked" in data:
+            changes["is_bookmarked"] = data["is_bookmarked"]
+        if "metadata" in data:
+            changes["metadata"] = JSONMerge(
+                "metadata", Value(data["metadata"], output_field=JSONField())
+            )
+
+        updated = 0
+        for start in range(0, len(photo_ids), self.CHUNK_SIZE):
+            chunk = photo_ids[start : start + self.CHUNK_SIZE]
+            updated += Photo.objects.filter(id__in=chunk).update(**changes)
+
+        # update() sends no signals
+        if updated:
+            record_changes(photo_audience(photo_ids), photo_ids=photo_ids)
+
+        return {"updated": updated}
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    # Absolute path of an API endpoint, with the query string if any
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False, allow_null=True, default=None)
+
+    def validate_path(self, path):
+        if not path.startswith("/api/") or path.startswith("/api/batch"):
+            raise serializers.ValidationError(
+                "Must be the path of an API endpoint other than /api/batch."
+            )
+        return path
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(
+        child=BatchRequestSerializer(),
+        min_length=1,
+        max_length=settings.BATCH_MAX_REQUESTS,
+    )
+
+
+class DeletionJobSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    status_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DeletionJob
+        fields = [
+            "id",
+            "target_type",
+            "target_ids",
+            "status",
+            "total_photos",
+            "deleted_photos",
+            "error",
+            "created_at",
+            "updated_at",
+            "completed_at",
+            "status_url",
+        ]
+        read_only_fields = fields
+
+    def get_status_url(self, obj):
+        """The job's progress, readable without logging in."""
+        request = self.context.get("request")
+        url = reverse("deletion-status", args=[get_status_token(obj)])
+        return request.build_absolute_uri(url) if request else url
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(required=True)
     password = serializers.CharField(
@@ -231,7 +658,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return user
 
 
-class HomePagePhotoSerializer(serializers.ModelSerializer):
+class HomePagePhotoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     username = serializers.SerializerMethodField()
     is_shared = serializers.SerializerMethodField()
 
@@ -257,12 +684,13 @@ class HomePagePhotoSerializer(serializers.ModelSerializer):
         return False
 
 
-class HomePageAlbumSerializer(serializers.ModelSerializer):
+class HomePageAlbumSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     photo_count = serializers.SerializerMethodField()
     cover_image = serializers.SerializerMethodField()
     username = serializers.SerializerMethodField()
     is_shared = serializers.SerializerMethodField()
     photos = serializers.SerializerMethodField()
+    contact_sheet = serializers.SerializerMethodField()
 
     class Meta:
         model = Album
@@ -275,15 +703,11 @@ class HomePageAlbumSerializer(serializers.ModelSerializer):
             "username",
             "is_shared",
             "photos",
+            "contact_sheet",
         ]
 
     def get_photo_count(self, obj):
-        photos_count = obj.photos.count()
-
-        if obj.cover_photo and not obj.photos.filter(id=obj.cover_photo.id).exists():
-            return photos_count + 1
-
-        return photos_count
+        return len(self.get_album_photos(obj))
 
     def get_cover_image(self, obj):
         request = self.context.get("request")
@@ -304,17 +728,223 @@ class HomePageAlbumSerializer(serializers.ModelSerializer):
             return obj.user != request.user
         return False
 
+    def get_contact_sheet(self, obj):
+        """
+        The previews of the album in one image, see photos.contact_sheets, and the
+        position of each photo in it. None until it is rendered.
+        """
+        if not obj.contact_sheet:
+            return None
+        request = self.context.get("request")
+        url = obj.contact_sheet.url
+        layout = obj.contact_sheet_layout
+        return {
+            "url": request.build_absolute_uri(url) if request else url,
+            "width": layout["width"],
+            "height": layout["height"],
+            "tiles": layout["tiles"],
+        }
+
     def get_photos(self, obj):
-        # Get all photos in the album
+        # Use the existing photo serializer
+        from .serializers import HomePagePhotoSerializer
+
+        return HomePagePhotoSerializer(
+            self.get_album_photos(obj),
+            many=True,
+            context={**self.context, "nested": True},
+        ).data
+
+    def get_album_photos(self, obj):
+        """
+        Returns the album photos plus the cover photo when it isn't one of them.
+
+        Works from `obj.photos.all()` so a `prefetch_related("photos")` on the
+        queryset serves both photo_count and photos without extra queries.
+        """
         album_photos = list(obj.photos.all())
 
         # Include cover photo if it exists and isn't already in the album photos
-        if obj.cover_photo and not obj.photos.filter(id=obj.cover_photo.id).exists():
+        if obj.cover_photo and obj.cover_photo_id not in {
+            photo.id for photo in album_photos
+        }:
             album_photos.append(obj.cover_photo)
 
-        # Use the existing photo serializer
-        from .serializers import HomePagePhotoSerializer
+        return album_photos
 
-        return HomePagePhotoSerializer(
-            album_photos, many=True, context=self.context
-        ).data
+
+class Column(NamedTuple):
+    """A field of a ValuesListSerializer, read from one column."""
+
+    column: str
+    # "image" or "datetime", formatted like the ModelSerializer field
+    format: str = None
+    # Builds the annotation holding the value, given the path to the model
+    annotation: Callable = None
+
+
+class Nested(NamedTuple):
+    """A related object of a ValuesListSerializer, or its ID when collapsed."""
+
+    fields: dict
+
+
+def album_photo_count(path):
+    # Same as Album.objects.with_photo_count(), for the album at `path`
+    return Subquery(
+        Album.all_objects.filter(pk=OuterRef(f"{path}pk"))
+        .with_photo_count()
+        .values("total_photos")
+    )
+
+
+USER_FIELDS = {
+    "id": Column("id"),
+    "username": Column("username"),
+    "email": Column("email"),
+}
+PHOTO_FIELDS = {
+    "id": Column("id"),
+    "image": Column("image", "image"),
+    "created_at": Column("created_at", "datetime"),
+    "updated_at": Column("updated_at", "datetime"),
+    "format": Column("format"),
+    "is_bookmarked": Column("is_bookmarked"),
+    "metadata": Column("metadata"),
+}
+ALBUM_FIELDS = {
+    "id": Column("id"),
+    "name": Column("name"),
+    "description": Column("description"),
+    "cover_photo": Nested(PHOTO_FIELDS),
+    "created_at": Column("created_at", "datetime"),
+    "updated_at": Column("updated_at", "datetime"),
+    "photo_count": Column("total_photos", annotation=album_photo_count),
+}
+COLLABORATION_FIELDS = {
+    "id": Column("id"),
+    "shared_by": Nested(USER_FIELDS),
+    "shared_with": Nested(USER_FIELDS),
+    "message": Column("message"),
+    "content_type": Column("content_type"),
+    "photo": Nested(PHOTO_FIELDS),
+    "album": Nested(ALBUM_FIELDS),
+    "permission": Column("permission"),
+    "created_at": Column("created_at", "datetime"),
+}
+
+
+class ValuesListSerializer:
+    """
+    Read-only serializer for list endpoints, with the same output as the
+    ModelSerializer it stands in for, including `?fields=` and `?expand=`.
+
+    Rows are read with values_list() and turned into dicts directly, so no model
+    is instantiated and no DRF field runs per row. Only the columns, joins and
+    annotations of the selected fields are queried. Keep `fields` in sync with
+    the ModelSerializers above when their fields change.
+    """
+
+    fields = {}
+    # Whether the request's `?fields=` and `?expand=` apply
+    sparse = True
+
+    def __init__(self, context):
+        request = context["request"]
+        # ImageField builds its URLs from the absolute MEDIA_URL of the request
+        self.media_url = request.build_absolute_uri(settings.MEDIA_URL)
+        self.timezone = timezone.get_current_timezone()
+
+        fields, expand = self.fields, None
+        sparse = get_sparse_fields(request) if self.sparse else None
+        if sparse is not None:
+            requested, expand = sparse
+            if requested is not None:
+                fields = {
+                    name: field for name, field in fields.items() if name in requested
+                }
+
+        self.columns = {}
+        self.annotations = {}
+        self.to_representation = self.build(fields, "", expand)
+
+    def get_rows(self, queryset):
+        return (
+            queryset.prefetch_related(None)
+            .annotate(**self.annotations)
+            .values_list(*self.columns)
+        )
+
+    def serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+    def add_column(self, column):
+        return self.columns.setdefault(column, len(self.columns))
+
+    def build(self, fields, path, expand=None):
+        """
+        Adds the columns read by `fields` of the model at `path` to the query.
+
+        Returns:
+            Callable: Builds the output of the fields from a row.
+        """
+        formats = {"image": self.image_url, "datetime": self.datetime}
+        getters = []
+        for name, field in fields.items():
+            if isinstance(field, Nested):
+                if expand is None or name in expand:
+                    getters.append((name, self.build(field.fields, f"{path}{name}__")))
+                else:
+                    getters.append((name, itemgetter(self.add_column(path + name))))
+                continue
+
+            if field.annotation is not None:
+                alias = (path + field.column).replace("__", "_")
+                self.annotations[alias] = field.annotation(path)
+                index = self.add_column(alias)
+            else:
+                index = self.add_column(path + field.column)
+
+            formatter = formats.get(field.format)
+            if formatter is None:
+                getters.append((name, itemgetter(index)))
+            else:
+                getters.append((name, lambda row, i=index, f=formatter: f(row[i])))
+
+        if not path:
+            return lambda row: {name: getter(row) for name, getter in getters}
+
+        # A related object is null when its ID is
+        id_index = self.add_column(path + "id")
+        return lambda row: (
+            None
+            if row[id_index] is None
+            else {name: getter(row) for name, getter in getters}
+        )
+
+    def image_url(self, name):
+        return self.media_url + filepath_to_uri(name).lstrip("/") if name else None
+
+    def datetime(self, value):
+        # Same as DRF's DateTimeField: the current time zone, "Z" for UTC
+        value = value.astimezone(self.timezone).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+class PhotoListSerializer(ValuesListSerializer):
+    """List output of PhotoSerializer."""
+
+    fields = PHOTO_FIELDS
+
+
+class AlbumListSerializer(ValuesListSerializer):
+    """List output of AlbumSerializer."""
+
+    fields = ALBUM_FIELDS
+
+
+class CollaborationListSerializer(ValuesListSerializer):
+    """List output of CollaborationSerializer."""
+
+    fields = COLLABORATION_FIELDS
@@ -0,0 +1,134 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import (
+    m2m_changed,
+    post_save,
+    post_delete,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from app.auth_cache import token_cache
+from . import contact_sheets
+from .models import Photo, Album, Collaboration, Change
+from .versions import (
+    album_audience,
+    album_contents,
+    is_muted,
+    log_changes,
+    photo_audience,
+    record_changes,
+    shared_item_changes,
+)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_tokens(sender, instance, **kwargs):
+    """
+    Drops the user's cached tokens on every change, which covers password
+    changes, deactivation and updates to the cached username/email.
+    """
+    token_cache.invalidate_user(instance.id)
+
+
+@receiver(pre_save, sender=Photo)
+def photo_saving(sender, instance, **kwargs):
+    # A new upload isn't committed to storage until the save
+    instance.image_replaced = bool(instance.image) and not instance.image._committed
+
+
+@receiver(post_save, sender=Photo)
+def photo_saved(sender, instance, created, **kwargs):
+    if is_muted() or instance.is_hidden:
+        return
+    if created:
+        record_changes([instance.user_id], photo_ids=[instance.id])
+    else:
+        record_changes(photo_audience([instance.id]), photo_ids=[instance.id])
+        if getattr(instance, "image_replaced", False):
+            contact_sheets.schedule_for_photos([instance.id])
+
+
+@receiver(pre_delete, sender=Photo)
+def photo_deleted(sender, instance, **kwargs):
+    # Before the delete, while its shares and album links still exist
+    if not is_muted() and not instance.is_hidden:
+        record_changes(photo_audience([instance.id]), photo_ids=[instance.id])
+
+
+@receiver(pre_save, sender=Album)
+def album_saving(sender, instance, update_fields=None, **kwargs):
+    # The cover before the save, unless the save can't change it
+    instance.old_cover_photo_id = instance.cover_photo_id
+    if is_muted() or instance._state.adding:
+        return
+    if update_fields is None or {"cover_photo", "cover_photo_id"} & update_fields:
+        instance.old_cover_photo_id = (
+            Album.all_objects.filter(id=instance.id)
+            .values_list("cover_photo_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Album)
+def album_saved(sender, instance, created, **kwargs):
+    if is_muted() or instance.is_hidden:
+        return
+    # The album's audience gains or loses sight of the covers, which need not be
+    # in the album
+    old_cover_id = getattr(instance, "old_cover_photo_id", instance.cover_photo_id)
+    photo_ids = ()
+    if old_cover_id != instance.cover_photo_id:
+        photo_ids = {old_cover_id, instance.cover_photo_id} - {None}
+    if created:
+        record_changes([instance.user_id], album_ids=[instance.id])
+    else:
+        record_changes(
+            album_audience([instance.id]), album_ids=[instance.id], photo_ids=photo_ids
+        )
+    # The cover may have changed, the sheet is left alone if it didn't
+    contact_sheets.schedule([instance.id])
+
+
+@receiver(pre_delete, sender=Album)
+def album_deleted(sender, instance, **kwargs):
+    if not is_muted() and not instance.is_hidden:
+        # Sharees lose access to the photos they only saw in the album
+        record_changes(
+            album_audience([instance.id]),
+            album_ids=[instance.id],
+            photo_ids=album_contents([instance.id])[instance.id],
+        )
+
+
+@receiver(m2m_changed, sender=Album.photos.through)
+def album_photos_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if is_muted() or action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        # photo.albums was changed: pk_set holds album IDs (None when cleared)
+        album_ids = pk_set or list(instance.albums.values_list("id", flat=True))
+        photo_ids = [instance.id]
+    else:
+        album_ids = [instance.id]
+        photo_ids = pk_set or list(instance.photos.values_list("id", flat=True))
+    # Sharees of the albums gain or lose access to the photos
+    record_changes(album_audience(album_ids), album_ids=album_ids, photo_ids=photo_ids)
+    contact_sheets.schedule(album_ids)
+
+
+@receiver(post_save, sender=Collaboration)
+@receiver(post_delete, sender=Collaboration)
+def collaboration_changed(sender, instance, **kwargs):
+    if not is_muted():
+        log_changes(
+            [
+                Change(
+                    user_id=instance.shared_by_id,
+                    kind="COLLABORATION",
+                    object_id=instance.id,
+                ),
+                *shared_item_changes([instance]),
+            ]
+        )
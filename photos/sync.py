@@ -0,0 +1,151 @@
+"""
+Delta sync: what changed for a user since a cursor, from the Change log.
+
+A cursor is the `seq` of the last Change a client has applied and the time it
+was issued. Clients get their first cursor from the start line of /api/export/,
+then call /api/sync?since=<cursor> with the cursor of each response. A change is
+returned as an upsert with the object's current data when the user can still see
+it, or as a delete when it is gone or no longer shared with them.
+
+A user's changes commit in `seq` order, see photos.versions.log_changes(), so
+every change after a cursor is either visible or yet to commit, and a cursor
+never skips one. This holds on a lagging replica too: it only shows fewer
+changes, and each request reads from a single replica.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .export import (
+    AlbumExportSerializer,
+    CollaborationExportSerializer,
+    PhotoExportSerializer,
+    get_albums,
+    get_collaborations,
+    get_photos,
+)
+from .models import Album, Change, LibraryVersion
+
+
+class ResyncRequired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = (
+        "Changes since this cursor are unavailable, export the library again."
+    )
+    default_code = "resync_required"
+
+
+def make_cursor(seq, issued_at):
+    return f"{seq}-{int(issued_at.timestamp())}"
+
+
+def parse_cursor(cursor):
+    """
+    Returns:
+        tuple: The `seq` of the last Change seen and when the cursor was issued.
+    """
+    seq, _, issued_at = (cursor or "").partition("-")
+    if not seq.isdigit() or not issued_at.isdigit():
+        raise ValidationError(
+            {"since": "Expected the cursor of /api/export/ or of a previous sync."}
+        )
+
+    issued_at = datetime.fromtimestamp(int(issued_at), tz=dt_timezone.utc)
+    # Older changes may have been pruned
+    retention = timedelta(days=settings.SYNC_RETENTION_DAYS)
+    if issued_at < timezone.now() - retention:
+        raise ResyncRequired()
+    return int(seq), issued_at
+
+
+def current_cursor(user):
+    """A cursor after every change committed so far, for clients that just exported."""
+    version = (
+        LibraryVersion.objects.filter(user_id=user.id)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return make_cursor(version or 0, timezone.now())
+
+
+def get_changes(user, context, cursor):
+    """
+    Returns:
+        dict: The next cursor, whether more changes are waiting, and the upserts
+        and deletes of photos, albums and collaborations since `cursor`.
+    """
+    since, _ = parse_cursor(cursor)
+
+    rows = list(
+        Change.objects.filter(user_id=user.id, seq__gt=since)
+        .order_by("seq")
+        .values_list("seq", "kind", "object_id")[: settings.SYNC_PAGE_SIZE]
+    )
+    has_more = len(rows) == settings.SYNC_PAGE_SIZE
+
+    changed = {"PHOTO": set(), "ALBUM": set(), "COLLABORATION": set()}
+    last_seq = since
+    for seq, kind, object_id in rows:
+        if kind == "RESET":
+            raise ResyncRequired()
+        changed[kind].add(object_id)
+        last_seq = seq
+
+    photos = get_upserts(
+        PhotoExportSerializer(context), get_photos(user), changed["PHOTO"]
+    )
+    albums = get_upserts(
+        AlbumExportSerializer(context), get_albums(user), changed["ALBUM"]
+    )
+    add_photo_ids(albums)
+    collaborations = get_upserts(
+        CollaborationExportSerializer(context),
+        get_collaborations(user),
+        changed["COLLABORATION"],
+    )
+
+    return {
+        "cursor": make_cursor(last_seq, timezone.now()),
+        "has_more": has_more,
+        "upserts": {
+            "photos": photos,
+            "albums": albums,
+            "collaborations": collaborations,
+        },
+        "deletes": {
+            "photos": get_deletes(changed["PHOTO"], photos),
+            "albums": get_deletes(changed["ALBUM"], albums),
+            "collaborations": get_deletes(changed["COLLABORATION"], collaborations),
+        },
+    }
+
+
+def get_upserts(serializer, queryset, ids):
+    if not ids:
+        return []
+    rows = serializer.get_rows(queryset.filter(id__in=ids).order_by("id"))
+    return serializer.serialize(rows)
+
+
+def get_deletes(ids, upserts):
+    return sorted(ids - {data["id"] for data in upserts})
+
+
+def add_photo_ids(albums):
+    """Adds the IDs of their photos to the albums, as in the export."""
+    photo_ids = {album["id"]: [] for album in albums}
+    memberships = (
+        Album.photos.through.objects.filter(
+            album_id__in=photo_ids, photo__is_hidden=False
+        )
+        .order_by("album_id", "photo_id")
+        .values_list("album_id", "photo_id")
+    )
+    for album_id, photo_id in memberships:
+        photo_ids[album_id].append(photo_id)
+    for album in albums:
+        album["photos"] = photo_ids[album["id"]]
@@ -0,0 +1,25 @@
+import orjson
+from django.contrib.auth.models import User
+from django.test import Client, TransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+# Concurrent sub-requests run on connections of their own, so they only see
+# committed rows
+class BatchViewTests(TransactionTestCase):
+    def test_token_authenticated_batch_is_csrf_exempt(self):
+        user = User.objects.create_user("batch@example.com", "batch@example.com")
+        client = Client(
+            enforce_csrf_checks=True,
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}",
+        )
+
+        response = client.post(
+            "/api/batch",
+            {"requests": [{"method": "GET", "path": "/api/photos/"}]},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        responses = orjson.loads(response.content)["responses"]
+        self.assertEqual([sub["status"] for sub in responses], [200])
@@ -1,32 +1,65 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     PhotoViewSet,
     AlbumViewSet,
     ShareViewSet,
+    DeletionJobViewSet,
+    DeletionStatusView,
     SharedWithMePhotosView,
     SharedWithMeAlbumsView,
     UserCreateView,
-    HomePageView
+    UserDeleteView,
+    HomePageView,
+    ExportView,
+    SyncView,
 )
+from .batch import BatchView
+from .events import EventStreamView
+from .async_views import (
+    AsyncSharedWithMePhotosView,
+    AsyncSharedWithMeAlbumsView,
+    AsyncHomePageView,
+)
+
+if settings.ASYNC_VIEWS:
+    shared_with_me_photos_view = AsyncSharedWithMePhotosView.as_view()
+    shared_with_me_albums_view = AsyncSharedWithMeAlbumsView.as_view()
+    homepage_view = AsyncHomePageView.as_view()
+else:
+    shared_with_me_photos_view = SharedWithMePhotosView.as_view()
+    shared_with_me_albums_view = SharedWithMeAlbumsView.as_view()
+    homepage_view = HomePageView.as_view()
 
 router = DefaultRouter()
 router.register(r"photos", PhotoViewSet, basename="photo")
 router.register(r"albums", AlbumViewSet, basename="album")
 router.register(r"share", ShareViewSet, basename="share")
+router.register(r"deletions", DeletionJobViewSet, basename="deletion")
 
 urlpatterns = [
     path("", include(router.urls)),
     path(
         "share/received/photos/",
-        SharedWithMePhotosView.as_view(),
+        shared_with_me_photos_view,
         name="shared-with-me-photos",
     ),
     path(
         "share/received/albums/",
-        SharedWithMeAlbumsView.as_view(),
+        shared_with_me_albums_view,
         name="shared-with-me-albums",
     ),
     path('users/register/', UserCreateView.as_view(), name='user-register'),
-    path('homepage/', HomePageView.as_view(), name='homepage'),
+    path('users/me/', UserDeleteView.as_view(), name='user-delete'),
+    path('homepage/', homepage_view, name='homepage'),
+    path("export/", ExportView.as_view(), name="export"),
+    path("sync", SyncView.as_view(), name="sync"),
+    path("batch", BatchView.as_view(), name="batch"),
+    path("events", EventStreamView.as_view(), name="events"),
+    path(
+        "deletions/status/<str:token>/",
+        DeletionStatusView.as_view(),
+        name="deletion-status",
+    ),
 ]
@@ -0,0 +1,308 @@
+"""
+Per-user library versions and change log.
+
+The collections a user polls (homepage, photos, albums, shares) join photos,
+albums, album contents and collaborations, so no single `updated_at` tells whether
+they changed. Instead, every change is recorded for each user who can see it: the
+owner, the users it is shared with and the owners of albums it is in. Model changes
+are recorded by photos.signals; code writing with update() or bulk_create()
+records them itself.
+
+Recording a change bumps the user's LibraryVersion, so a poll costs one primary
+key lookup and is answered with 304 Not Modified when the version in its ETag is
+still current. It also logs the changed objects as Change rows, which
+photos.sync turns into upserts and deletes, and pushes an event of their kind to
+the user's open /api/events streams.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from app.broadcast import broadcaster
+from app.db_router import use_replica
+from app.metrics import record_cache_lookup
+from .models import Photo, Album, Collaboration, Change, LibraryVersion
+
+local = threading.local()
+
+# Event types pushed to /api/events, by Change kind
+EVENTS = {
+    "PHOTO": "photo",
+    "ALBUM": "album",
+    "COLLABORATION": "share",
+    "RESET": "reset",
+}
+
+
+@contextmanager
+def muted():
+    """
+    Ignores the changes made by the signal handlers in this thread, for bulk code
+    that bumps the affected users itself.
+    """
+    local.muted = True
+    try:
+        yield
+    finally:
+        local.muted = False
+
+
+def is_muted():
+    return getattr(local, "muted", False)
+
+
+def bump_users(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        # Users without a row never got an ETag, so there is nothing to bump
+        LibraryVersion.objects.filter(user_id__in=user_ids).update(
+            version=F("version") + 1, updated_at=timezone.now()
+        )
+
+
+def log_changes(changes):
+    """
+    Saves Change rows, bumps the versions of their users and notifies them.
+
+    The changes of a user are numbered after the user's version, under a lock of
+    its row held until the transaction commits, so they commit in `seq` order:
+    a sync cursor never moves past a change that is yet to be committed.
+    """
+    changes = [change for change in changes if change.user_id is not None]
+    if not changes:
+        return
+
+    with transaction.atomic():
+        versions = lock_versions({change.user_id for change in changes})
+        # Accounts deleted meanwhile have nobody left to sync
+        changes = [change for change in changes if change.user_id in versions]
+        for change in changes:
+            library_version = versions[change.user_id]
+            library_version.version += 1
+            library_version.updated_at = timezone.now()
+            change.seq = library_version.version
+        Change.objects.bulk_create(changes, batch_size=1000)
+        LibraryVersion.objects.bulk_update(
+            versions.values(), ["version", "updated_at"], batch_size=1000
+        )
+
+    events = defaultdict(set)
+    for change in changes:
+        events[change.user_id].add(EVENTS[change.kind])
+    broadcaster.publish(events)
+
+
+def lock_versions(user_ids):
+    """
+    Returns:
+        dict: The LibraryVersion of each of the users, locked until the end of the
+        transaction and created for those who have none yet.
+    """
+
+    def select():
+        # Always locked in the same order, so concurrent writers can't deadlock
+        return {
+            library_version.user_id: library_version
+            for library_version in LibraryVersion.objects.select_for_update()
+            .filter(user_id__in=user_ids)
+            .order_by("user_id")
+        }
+
+    versions = select()
+    missing = set(user_ids) - versions.keys()
+    if missing:
+        LibraryVersion.objects.bulk_create(
+            [
+                LibraryVersion(user_id=user_id)
+                for user_id in User.objects.filter(id__in=missing).values_list(
+                    "id", flat=True
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        versions = select()
+    return versions
+
+
+def record_changes(
+    user_ids, photo_ids=(), album_ids=(), collaboration_ids=(), reset=False
+):
+    """Records the same changed objects for each of the users."""
+    objects = [("PHOTO", object_id) for object_id in set(photo_ids)]
+    objects += [("ALBUM", object_id) for object_id in set(album_ids)]
+    objects += [("COLLABORATION", object_id) for object_id in set(collaboration_ids)]
+    if reset:
+        objects.append(("RESET", None))
+
+    log_changes(
+        Change(user_id=user_id, kind=kind, object_id=object_id)
+        for user_id in set(user_ids)
+        for kind, object_id in objects
+    )
+
+
+def shared_item_changes(collaborations):
+    """
+    Changes of the users things were shared with or unshared from: the share,
+    and the photo, or the album and what it shows.
+    """
+    album_ids = {c.album_id for c in collaborations if c.album_id is not None}
+    contents = album_contents(album_ids)
+
+    changes = []
+    for collaboration in collaborations:
+        objects = [("COLLABORATION", collaboration.id)]
+        if collaboration.photo_id is not None:
+            objects.append(("PHOTO", collaboration.photo_id))
+        if collaboration.album_id is not None:
+            objects.append(("ALBUM", collaboration.album_id))
+            objects += [
+                ("PHOTO", photo_id) for photo_id in contents[collaboration.album_id]
+            ]
+        changes += [
+            Change(user_id=collaboration.shared_with_id, kind=kind, object_id=object_id)
+            for kind, object_id in objects
+        ]
+    return changes
+
+
+def album_contents(album_ids):
+    """
+    Returns:
+        dict: The IDs of the photos and cover photo of each album.
+    """
+    contents = {album_id: set() for album_id in album_ids}
+    if not album_ids:
+        return contents
+
+    for album_id, photo_id in Album.photos.through.objects.filter(
+        album_id__in=album_ids
+    ).values_list("album_id", "photo_id"):
+        contents[album_id].add(photo_id)
+    for album_id, photo_id in Album.all_objects.filter(
+        id__in=album_ids, cover_photo__isnull=False
+    ).values_list("id", "cover_photo_id"):
+        contents[album_id].add(photo_id)
+    return contents
+
+
+def photo_audience(photo_ids):
+    """Users who can see the photos: owners, sharees and album audiences."""
+    album_ids = set(
+        Album.photos.through.objects.filter(photo_id__in=photo_ids).values_list(
+            "album_id", flat=True
+        )
+    )
+    album_ids.update(
+        Album.all_objects.filter(cover_photo_id__in=photo_ids).values_list(
+            "id", flat=True
+        )
+    )
+    users = set(
+        Photo.all_objects.filter(id__in=photo_ids).values_list("user_id", flat=True)
+    )
+    users.update(
+        Collaboration.objects.filter(
+            content_type="PHOTO", photo_id__in=photo_ids
+        ).values_list("shared_with_id", flat=True)
+    )
+    return users | album_audience(album_ids)
+
+
+def album_audience(album_ids):
+    """Users who can see the albums: owners and sharees."""
+    if not album_ids:
+        return set()
+
+    users = set(
+        Album.all_objects.filter(id__in=album_ids).values_list("user_id", flat=True)
+    )
+    users.update(
+        Collaboration.objects.filter(
+            content_type="ALBUM", album_id__in=album_ids
+        ).values_list("shared_with_id", flat=True)
+    )
+    return users
+
+
+def user_audience(user_ids):
+    """Users who can see anything owned by the users, including themselves."""
+    users = set(user_ids)
+    users.update(
+        Collaboration.objects.filter(shared_by_id__in=user_ids).values_list(
+            "shared_with_id", flat=True
+        )
+    )
+    users.update(
+        Album.all_objects.filter(photos__user_id__in=user_ids).values_list(
+            "user_id", flat=True
+        )
+    )
+    return users
+
+
+def get_validators(library_version):
+    # Weak, as the representation also depends on the URL and the encoding
+    etag = f'W/"{library_version.user_id}-{library_version.version}"'
+    return etag, int(library_version.updated_at.timestamp())
+
+
+def conditional_response(request, library_version):
+    """
+    Returns:
+        HttpResponse: 304 Not Modified when the client's copy is current, or
+        None when the view has to render the response.
+    """
+    etag, last_modified = get_validators(library_version)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if "If-None-Match" in request.headers or "If-Modified-Since" in request.headers:
+        # Hits are polls answered from the client's cached copy
+        record_cache_lookup("conditional_get", response is not None)
+    return response
+
+
+def set_validators(response, library_version):
+    """Sets the ETag and Last-Modified headers of a 200 or 304 response."""
+    if response.status_code in (200, 304):
+        etag, last_modified = get_validators(library_version)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        # The validators are per user
+        patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+def get_library_version(user):
+    """
+    Reads the version before the body and from the same database, so the body is
+    at least as new as the version its validators claim.
+
+    Returns:
+        LibraryVersion: The user's version, created on first use.
+    """
+    try:
+        return LibraryVersion.objects.get(user=user)
+    except LibraryVersion.DoesNotExist:
+        # Not created yet, or not replicated yet: the rest of the request reads
+        # from the primary, where the row is created
+        use_replica(False)
+        library_version, _ = LibraryVersion.objects.get_or_create(user=user)
+        return library_version
+
+
+async def aget_library_version(user):
+    try:
+        return await LibraryVersion.objects.aget(user=user)
+    except LibraryVersion.DoesNotExist:
+        use_replica(False)
+        library_version, _ = await LibraryVersion.objects.aget_or_create(user=user)
+        return library_version
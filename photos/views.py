@@ -1,5 +1,8 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from drf_spectacular.utils import (
@@ -10,19 +13,69 @@ from drf_spectacular.utils import (
 )
 
 
-from .models import Photo, Album, Collaboration, User
+from app.metrics import record_upload
+from .deletion import get_job_by_status_token, schedule_deletion
+from .export import aexport_lines, export_lines, parse_after
+from .models import Photo, Album, Collaboration, DeletionJob, User
+from .sync import current_cursor, get_changes
+from .versions import conditional_response, get_library_version, set_validators
 from .serializers import (
     PhotoSerializer,
     PhotoDetailSerializer,
     AlbumSerializer,
     AlbumDetailSerializer,
     CollaborationSerializer,
+    BulkCollaborationSerializer,
+    BulkPhotoUpdateSerializer,
+    DeletionJobSerializer,
     UserCreateSerializer,
     HomePagePhotoSerializer,
     HomePageAlbumSerializer,
+    PhotoListSerializer,
+    AlbumListSerializer,
+    CollaborationListSerializer,
 )
 
 
+# Answers list GETs with 304 Not Modified while the user's LibraryVersion is
+# unchanged, see photos.versions.
+class ConditionalGetMixin:
+    def list(self, request, *args, **kwargs):
+        library_version = get_library_version(request.user)
+        not_modified = conditional_response(request, library_version)
+        if not_modified is not None:
+            return set_validators(not_modified, library_version)
+
+        response = super().list(request, *args, **kwargs)
+        return set_validators(response, library_version)
+
+
+# Trims the queryset of read requests to what the serializer renders, see
+# SparseFieldsMixin.trim_queryset().
+class TrimmedQuerysetMixin:
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method == "GET":
+            queryset = self.get_serializer().trim_queryset(queryset)
+        return queryset
+
+
+# Serves the list action with a ValuesListSerializer, which builds the page
+# from values_list() rows instead of model instances.
+class ValuesListMixin:
+    list_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.list_serializer_class(context=self.get_serializer_context())
+        rows = serializer.get_rows(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+
+        return Response(serializer.serialize(rows))
+
+
 class UserCreateView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
@@ -41,9 +94,49 @@ class UserCreateView(generics.CreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
+class UserDeleteView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = DeletionJobSerializer
+
+    @extend_schema(
+        tags=["User Management"],
+        summary="Delete my account",
+        description=(
+            "Deactivates the account and hides its photos and albums immediately, "
+            "and deletes them and its shares in the background. Follow the "
+            "deletion at the job's `status_url`, which needs no login"
+        ),
+        responses={
+            202: OpenApiResponse(
+                response=DeletionJobSerializer,
+                description="Account deactivated, deletion scheduled",
+            ),
+            401: OpenApiResponse(
+                description="Authentication credentials were not provided"
+            ),
+        },
+    )
+    def delete(self, request, *args, **kwargs):
+        job = schedule_deletion(request.user, "USER", [request.user.id])
+        return Response(
+            DeletionJobSerializer(job, context={"request": request}).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
 @extend_schema(tags=["Photos"])
-class PhotoViewSet(viewsets.ModelViewSet):
+class PhotoViewSet(
+    ConditionalGetMixin, ValuesListMixin, TrimmedQuerysetMixin, viewsets.ModelViewSet
+):
     permission_classes = [IsAuthenticated]
+    list_serializer_class = PhotoListSerializer
+    # Endpoint classes of settings.RATE_LIMITS, see app/admission.py
+    rate_limit_scopes = {
+        "create": "upload",
+        "bulk": "bulk_upload",
+        "bulk_delete": "bulk",
+        "bulk_update": "bulk",
+    }
 
     def get_queryset(self):
         # Get user's own photos
@@ -59,6 +152,8 @@ class PhotoViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action in ["retrieve"]:
             return PhotoDetailSerializer
+        if self.action == "bulk_update":
+            return BulkPhotoUpdateSerializer
         return PhotoSerializer
 
     @extend_schema(
@@ -89,6 +184,10 @@ class PhotoViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        serializer.save()
+        record_upload(serializer.validated_data["image"].size)
+
     @extend_schema(
         tags=["Photos"],
         summary="Update a photo",
@@ -185,6 +284,7 @@ class PhotoViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(data=data)
             if serializer.is_valid():
                 serializer.save(user=request.user)
+                record_upload(image.size)
                 created_photos.append(serializer.data)
             else:
                 # You might want to handle errors differently here
@@ -193,10 +293,99 @@ class PhotoViewSet(viewsets.ModelViewSet):
 
         return Response(created_photos, status=status.HTTP_201_CREATED)
 
+    @extend_schema(
+        tags=["Photos"],
+        summary="Bulk delete photos",
+        description=(
+            "Hide the given photos immediately and delete them and their files in "
+            "the background. Only photos owned by the user are deleted."
+        ),
+        request={
+            "application/json": {
+                "type": "object",
+                "properties": {
+                    "photo_ids": {
+                        "type": "array",
+                        "items": {"type": "integer"},
+                    }
+                },
+                "required": ["photo_ids"],
+            }
+        },
+        responses={
+            202: OpenApiResponse(
+                response=DeletionJobSerializer,
+                description="Photos hidden, deletion scheduled",
+            ),
+            400: OpenApiResponse(description="No owned photos among the given IDs"),
+            401: OpenApiResponse(
+                description="Authentication credentials were not provided"
+            ),
+        },
+    )
+    @action(detail=False, methods=["post"])
+    def bulk_delete(self, request):
+        photo_ids = list(
+            Photo.objects.filter(
+                user=request.user, id__in=request.data.get("photo_ids", [])
+            ).values_list("id", flat=True)
+        )
+
+        if not photo_ids:
+            return Response(
+                {"error": "At least one photo owned by the user is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        job = schedule_deletion(request.user, "PHOTOS", photo_ids)
+        return Response(
+            DeletionJobSerializer(job, context={"request": request}).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @extend_schema(
+        tags=["Photos"],
+        summary="Bulk update photos",
+        description=(
+            "Set is_bookmarked and/or merge keys into the metadata of many photos at "
+            "once. Only photos owned by the user or shared with edit permission are "
+            "updated; returns how many were."
+        ),
+        request=BulkPhotoUpdateSerializer,
+        responses={
+            200: OpenApiResponse(description="Number of updated photos"),
+            400: OpenApiResponse(description="Invalid input"),
+            401: OpenApiResponse(
+                description="Authentication credentials were not provided"
+            ),
+        },
+        examples=[
+            OpenApiExample(
+                "Bookmark Example",
+                summary="Bookmark three photos and tag them",
+                value={
+                    "photo_ids": [1, 2, 3],
+                    "is_bookmarked": True,
+                    "metadata": {"trip": "Pokhara"},
+                },
+                request_only=True,
+            ),
+        ],
+    )
+    @action(detail=False, methods=["post"])
+    def bulk_update(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.update_photos(), status=status.HTTP_200_OK)
+
 
 @extend_schema(tags=["Albums"])
-class AlbumViewSet(viewsets.ModelViewSet):
+class AlbumViewSet(
+    ConditionalGetMixin, ValuesListMixin, TrimmedQuerysetMixin, viewsets.ModelViewSet
+):
     permission_classes = [IsAuthenticated]
+    list_serializer_class = AlbumListSerializer
+    rate_limit_scopes = {"add_photos": "bulk", "remove_photos": "bulk"}
 
     def get_queryset(self):
         # Get user's own albums
@@ -320,10 +509,73 @@ class AlbumViewSet(viewsets.ModelViewSet):
         serializer = AlbumDetailSerializer(album, context={"request": request})
         return Response(serializer.data)
 
+    @extend_schema(
+        tags=["Albums"],
+        summary="Delete an album",
+        description=(
+            "Hide the album immediately and delete it in the background. "
+            "The photos in the album are not deleted."
+        ),
+        responses={
+            202: OpenApiResponse(
+                response=DeletionJobSerializer,
+                description="Album hidden, deletion scheduled",
+            ),
+            403: OpenApiResponse(description="Album shared with the user"),
+            404: OpenApiResponse(description="Album not found"),
+        },
+    )
+    def destroy(self, request, *args, **kwargs):
+        album = self.get_object()
+        # Albums shared with the user are visible, but only the owner deletes
+        if album.user_id != request.user.id:
+            return Response(
+                {"detail": "You do not have permission to delete this album."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        job = schedule_deletion(request.user, "ALBUM", [album.id])
+        return Response(
+            DeletionJobSerializer(job, context={"request": request}).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+@extend_schema(tags=["Deletions"])
+class DeletionJobViewSet(TrimmedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
+    """Progress of the background deletions requested by the user."""
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = DeletionJobSerializer
+
+    def get_queryset(self):
+        return DeletionJob.objects.filter(requested_by=self.request.user)
+
+
+@extend_schema(tags=["Deletions"])
+class DeletionStatusView(generics.RetrieveAPIView):
+    """
+    Progress of a deletion job at the `status_url` returned with it. It needs no
+    login, so the progress of an account's deletion can be followed after the
+    account is deactivated.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    serializer_class = DeletionJobSerializer
+
+    def get_object(self):
+        job = get_job_by_status_token(self.kwargs["token"])
+        if job is None:
+            raise NotFound()
+        return job
+
 
 @extend_schema(tags=["Collaboration"])
-class ShareViewSet(viewsets.ModelViewSet):
+class ShareViewSet(ValuesListMixin, TrimmedQuerysetMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    list_serializer_class = CollaborationListSerializer
+    rate_limit_scopes = {"bulk": "bulk"}
     serializer_class = CollaborationSerializer
 
     def get_queryset(self):
@@ -399,6 +651,44 @@ class ShareViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @extend_schema(
+        summary="Share many items with many users",
+        description=(
+            "Share every given photo and album with every given user in one request. "
+            "Returns a result for each (item, email) pair: shared, already_shared, "
+            "user_not_found, cannot_share_with_self or permission_denied."
+        ),
+        request=BulkCollaborationSerializer,
+        responses={
+            200: OpenApiResponse(description="Per-pair sharing results"),
+            400: OpenApiResponse(description="Invalid input data or validation error"),
+            401: OpenApiResponse(
+                description="Authentication credentials were not provided"
+            ),
+        },
+        examples=[
+            OpenApiExample(
+                "Bulk Share Example",
+                summary="Share an album and two photos with two users",
+                value={
+                    "photo_ids": [1, 2],
+                    "album_ids": [1],
+                    "shared_with_emails": ["mom@example.com", "dad@example.com"],
+                    "permission": "VIEW",
+                    "message": "Holiday pictures",
+                },
+                request_only=True,
+            ),
+        ],
+    )
+    @action(
+        detail=False, methods=["post"], serializer_class=BulkCollaborationSerializer
+    )
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.share(), status=status.HTTP_200_OK)
+
     @extend_schema(
         summary="List sharing permissions",
         description="Retrieve all sharing permissions created by the current user",
@@ -486,9 +776,12 @@ class ShareViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema(tags=["Collaboration"])
-class SharedWithMePhotosView(generics.ListAPIView):
+class SharedWithMePhotosView(
+    ConditionalGetMixin, ValuesListMixin, generics.ListAPIView
+):
     permission_classes = [IsAuthenticated]
     serializer_class = PhotoSerializer
+    list_serializer_class = PhotoListSerializer
 
     @extend_schema(
         summary="List photos shared with me",
@@ -514,9 +807,12 @@ class SharedWithMePhotosView(generics.ListAPIView):
 
 
 @extend_schema(tags=["Collaboration"])
-class SharedWithMeAlbumsView(generics.ListAPIView):
+class SharedWithMeAlbumsView(
+    ConditionalGetMixin, ValuesListMixin, generics.ListAPIView
+):
     permission_classes = [IsAuthenticated]
     serializer_class = AlbumSerializer
+    list_serializer_class = AlbumListSerializer
 
     @extend_schema(
         summary="List albums shared with me",
@@ -542,9 +838,10 @@ class SharedWithMeAlbumsView(generics.ListAPIView):
 
 
 @extend_schema(tags=["Collaboration"])
-class SharedWithMeView(generics.ListAPIView):
+class SharedWithMeView(ValuesListMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = CollaborationSerializer
+    list_serializer_class = CollaborationListSerializer
 
     @extend_schema(
         summary="List all items shared with me",
@@ -598,6 +895,11 @@ class HomePageView(generics.GenericAPIView):
         },
     )
     def get(self, request):
+        library_version = get_library_version(request.user)
+        not_modified = conditional_response(request, library_version)
+        if not_modified is not None:
+            return set_validators(not_modified, library_version)
+
         # Get user's own photos
         user_photos = Photo.objects.filter(user=request.user)
 
@@ -609,7 +911,10 @@ class HomePageView(generics.GenericAPIView):
 
         # Combine the photo querysets and remove duplicates
         all_photos = (
-            (user_photos | shared_photos).distinct().order_by("-created_at")[:10]
+            (user_photos | shared_photos)
+            .distinct()
+            .select_related("user")
+            .order_by("-created_at")[:10]
         )
 
         # Get user's own albums
@@ -623,7 +928,11 @@ class HomePageView(generics.GenericAPIView):
 
         # Combine the album querysets and remove duplicates
         all_albums = (
-            (user_albums | shared_albums).distinct().order_by("-created_at")[:5]
+            (user_albums | shared_albums)
+            .distinct()
+            .select_related("user", "cover_photo__user")
+            .prefetch_related("photos__user")
+            .order_by("-created_at")[:5]
         )
 
         # Serialize the data
@@ -634,6 +943,102 @@ class HomePageView(generics.GenericAPIView):
             all_albums, many=True, context={"request": request}
         )
 
-        return Response(
+        response = Response(
             {"photos": photo_serializer.data, "albums": album_serializer.data}
         )
+        return set_validators(response, library_version)
+
+
+class ExportView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    rate_limit_scopes = {"get": "export"}
+
+    @extend_schema(
+        tags=["Export"],
+        summary="Export my library",
+        description=(
+            "Streams every photo, album (with the IDs of its photos) and share the "
+            "user can see as newline-delimited JSON. The first line has the "
+            "`cursor` to pass to /api/sync afterwards and the last line is "
+            '{"type": "end"}; an interrupted export is resumed with `after`, the '
+            "type and ID of the last line received."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="after",
+                description="Resume after this record, e.g. album:42",
+                required=False,
+                type=str,
+                location=OpenApiParameter.QUERY,
+            ),
+        ],
+        responses={
+            (200, "application/x-ndjson"): OpenApiResponse(
+                description="One JSON record per line"
+            ),
+            400: OpenApiResponse(description="Invalid `after` cursor"),
+            401: OpenApiResponse(
+                description="Authentication credentials were not provided"
+            ),
+        },
+    )
+    def get(self, request):
+        after = parse_after(request.query_params.get("after"))
+        context = {"request": request}
+        # Taken before reading anything, so changes made meanwhile are synced
+        cursor = current_cursor(request.user) if after is None else None
+
+        # Under ASGI a synchronous iterator would be read whole before sending
+        if isinstance(request._request, ASGIRequest):
+            lines = aexport_lines(request.user, context, after, cursor)
+        else:
+            lines = export_lines(request.user, context, after, cursor)
+
+        return StreamingHttpResponse(
+            lines,
+            content_type="application/x-ndjson",
+            headers={"Content-Disposition": 'attachment; filename="library.ndjson"'},
+        )
+
+
+class SyncView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=["Export"],
+        summary="Sync my library",
+        description=(
+            "Returns what changed in the user's library since `since`, the cursor "
+            "of the first line of /api/export/ or of the previous sync: the current "
+            "data of changed photos, albums and shares under `upserts`, and the IDs "
+            "of those the user can no longer see under `deletes`. Call again with "
+            "the returned `cursor` while `has_more` is true. 410 Gone means the "
+            "changes are no longer available and the library has to be exported "
+            "again."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="since",
+                description="Cursor of the export or of the previous sync",
+                required=True,
+                type=str,
+                location=OpenApiParameter.QUERY,
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(description="Changes since the cursor"),
+            400: OpenApiResponse(description="Missing or invalid cursor"),
+            401: OpenApiResponse(
+                description="Authentication credentials were not provided"
+            ),
+            410: OpenApiResponse(description="Export the library again"),
+        },
+    )
+    def get(self, request):
+        since = request.query_params.get("since")
+        if not since:
+            return Response(
+                {"since": "Required, export the library first with /api/export/."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(get_changes(request.user, {"request": request}, since))